@@ -0,0 +1,139 @@
+"""Throughput of LocalExecutor vs ShardedExecutor with 1, 2 and 4 workers
+
+Google Sheets is replaced by an in-memory sheet that sleeps like the API
+does, in every process, so only the executor layout changes between runs:
+
+    python benchmarks/bench_shards.py [users] [writes] [reads]
+
+Writes are adjust_points commands run the way IngestProcessor runs them
+(in order within a shard, shards side by side). Reads are concurrent
+/leaderboard-style gathers of get_rankings.
+"""
+import asyncio
+import os
+import sys
+import time
+from unittest import mock
+
+import gspread
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+with mock.patch.object(gspread, 'service_account'):
+    import sgi_bot_phase1  # noqa: E402
+
+HEADERS = ['Name', 'User_ID', 'Group', 'Current_Points', 'Strikes', 'Status']
+GROUPS = ['Finalist', 'Senior', 'Junior']
+READ_LATENCY = 0.05
+WRITE_LATENCY = 0.03
+
+
+class LatencySheet:
+    """Worksheet stand-in: a full read and a cell write each take an API round trip"""
+
+    id = 0
+
+    def __init__(self, users):
+        self.rows = [list(HEADERS)] + [
+            [f"User {user_id}", user_id, GROUPS[user_id % 3], user_id % 50, 0, 'Active']
+            for user_id in range(1, users + 1)
+        ]
+        self.col_count = len(HEADERS)
+
+    def get_all_records(self):
+        time.sleep(READ_LATENCY)
+        return [dict(zip(HEADERS, row)) for row in self.rows[1:]]
+
+    def row_values(self, row_num):
+        return list(self.rows[row_num - 1])
+
+    def update_cells(self, cells, **kwargs):
+        time.sleep(WRITE_LATENCY)
+        for cell in cells:
+            self.rows[cell.row - 1][cell.col - 1] = cell.value
+
+
+class LatencyClient:
+    def __init__(self, users):
+        self.users = users
+
+    def open_by_key(self, key):
+        return mock.Mock(sheet1=LatencySheet(self.users))
+
+
+def bench_worker(shard_id, num_shards, spreadsheet_id, admin_user_ids, task_queue, result_queue, users):
+    """shard_worker on the latency sheet, runs in the spawned process"""
+    sgi_bot_phase1.gc = LatencyClient(users)
+    sgi_bot_phase1.shard_worker(shard_id, num_shards, spreadsheet_id, admin_user_ids, task_queue, result_queue)
+
+
+async def run_writes(executor, users, writes):
+    by_shard = {}
+    for n in range(writes):
+        user_id = n * 7919 % users + 1
+        by_shard.setdefault(executor.shard_of(user_id), []).append(user_id)
+
+    async def run_shard(user_ids):
+        for user_id in user_ids:
+            success, message = await executor.call(user_id, 'adjust_points', user_id, 1, 'add')
+            assert success, message
+
+    await asyncio.gather(*(run_shard(user_ids) for user_ids in by_shard.values()))
+
+
+async def run_reads(executor, reads):
+    results = await asyncio.gather(*(executor.gather('get_rankings') for _ in range(reads)))
+    assert all(part is not None for parts in results for part in parts)
+
+
+async def measure(executor, users, writes, reads):
+    # Warm up the workers before timing
+    await executor.gather('get_rankings')
+    start = time.perf_counter()
+    await run_writes(executor, users, writes)
+    write_seconds = time.perf_counter() - start
+    start = time.perf_counter()
+    await run_reads(executor, reads)
+    read_seconds = time.perf_counter() - start
+    return writes / write_seconds, reads / read_seconds
+
+
+def main():
+    users = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    writes = int(sys.argv[2]) if len(sys.argv) > 2 else 80
+    reads = int(sys.argv[3]) if len(sys.argv) > 3 else 40
+    sgi_bot_phase1.gc = LatencyClient(users)
+    print(f"{users} users, {writes} writes, {reads} concurrent leaderboard reads")
+    print(f"{'executor':<12} {'writes/s':>10} {'reads/s':>10}")
+
+    executor = sgi_bot_phase1.LocalExecutor(sgi_bot_phase1.SGIBot('bench', '1'))
+    write_rate, read_rate = asyncio.run(measure(executor, users, writes, reads))
+    print(f"{'local':<12} {write_rate:>10.1f} {read_rate:>10.1f}")
+
+    for workers in (1, 2, 4):
+        executor = sgi_bot_phase1.ShardedExecutor(workers, 'bench', '1')
+        executor.context = BenchContext(executor.context, users)
+        executor.start()
+        try:
+            write_rate, read_rate = asyncio.run(measure(executor, users, writes, reads))
+        finally:
+            executor.stop()
+        print(f"{f'{workers} shards':<12} {write_rate:>10.1f} {read_rate:>10.1f}")
+
+
+class BenchContext:
+    """Multiprocessing context that starts bench_worker instead of shard_worker"""
+
+    def __init__(self, context, users):
+        self.context = context
+        self.users = users
+
+    def Queue(self):
+        return self.context.Queue()
+
+    def Process(self, target, args, daemon):
+        return self.context.Process(target=bench_worker, args=(*args, self.users), daemon=daemon)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,12 +1,33 @@
 import os
 import logging
 import json
-from datetime import datetime, date
+import asyncio
+import itertools
+import multiprocessing
+import threading
+import sqlite3
+import time
+import bisect
+import math
+import csv
+import gzip
+import io
+import tempfile
+from datetime import datetime, date, timedelta
+from enum import Enum
 import gspread
+from gspread.exceptions import APIError
+from google.auth.exceptions import TransportError
+from requests.exceptions import RequestException
 from google.oauth2.service_account import Credentials
 from google.auth.transport.requests import Request
-from telegram import Update
-from telegram.ext import Application, CommandHandler, ContextTypes
+from telegram import (
+    Update, InlineKeyboardButton, InlineKeyboardMarkup, InlineQueryResultArticle, InputTextMessageContent
+)
+from telegram.error import BadRequest, TelegramError
+from telegram.ext import (
+    Application, CommandHandler, CallbackQueryHandler, InlineQueryHandler, MessageHandler, ContextTypes, filters
+)
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -44,18 +65,517 @@ def setup_google_sheets():
 # Initialize Google Sheets client
 gc = setup_google_sheets()
 
+DB_ERROR_MSG = "Unable to connect to database. Please try again in a moment"
+REGISTER_ERROR_MSG = "Unable to register. Please try again"
+RECORD_ERROR_MSG = "Your record in the sheet could not be read. Please contact an admin"
+COMMAND_FAILED_MSG = "Sorry, your command could not be completed. Please try again later or contact an admin"
+COMMAND_TIMEOUT_MSG = "Your command is taking longer than usual. Check /mystatus in a minute before sending it again"
+ALREADY_APPLIED_MSG = "This command was already applied"
+# Replies that mean storage was unreachable and the command can be retried
+STORAGE_ERROR_MESSAGES = {DB_ERROR_MSG, REGISTER_ERROR_MSG}
+
+# Failures of Sheets or the network, worth retrying. Anything else is a bug
+# and is raised from write methods instead of being retried forever.
+STORAGE_ERRORS = (APIError, TransportError, RequestException, ConnectionError, TimeoutError)
+
+LEADERBOARD_GROUPS = ['Finalist', 'Senior', 'Junior']
+LEADERBOARD_SIZE = 10
+
+# How long a coalesced read may be reused by later callers
+READ_CACHE_SECONDS = float(os.getenv('READ_CACHE_SECONDS', '2'))
+
+# Minimum seconds between edits of a pinned leaderboard message
+LEADERBOARD_EDIT_INTERVAL = float(os.getenv('LEADERBOARD_EDIT_INTERVAL', '30'))
+
+# Leaderboard paging, and how long standings are trusted without a known change
+LEADERBOARD_PAGE_SIZE = int(os.getenv('LEADERBOARD_PAGE_SIZE', '10'))
+STANDINGS_MAX_AGE = float(os.getenv('STANDINGS_MAX_AGE', '300'))
+
+# Inline "@bot name" lookups: results per answer and how long Telegram may cache them
+INLINE_RESULTS_LIMIT = int(os.getenv('INLINE_RESULTS_LIMIT', '10'))
+INLINE_CACHE_SECONDS = int(os.getenv('INLINE_CACHE_SECONDS', '30'))
+
+# /admin_export: rows fetched per round trip, and bytes kept in memory before spilling to a temp file
+EXPORT_CHUNK_SIZE = int(os.getenv('EXPORT_CHUNK_SIZE', '500'))
+EXPORT_SPOOL_BYTES = int(os.getenv('EXPORT_SPOOL_BYTES', str(1024 * 1024)))
+ROSTER_EXPORT_FIELDS = ['user_id', 'name', 'group', 'points', 'strikes', 'status', 'tasks_done']
+EVENT_EXPORT_FIELDS = [
+    'update_id', 'user_id', 'command', 'args', 'status', 'attempts', 'result', 'created_at', 'processed_at'
+]
+
+# Queued commands failing on storage this many times are dead-lettered
+INGEST_MAX_ATTEMPTS = int(os.getenv('INGEST_MAX_ATTEMPTS', '20'))
+
+# Bulk registration: largest CSV accepted, and invalid lines listed in the reply
+IMPORT_MAX_BYTES = int(os.getenv('IMPORT_MAX_BYTES', str(1024 * 1024)))
+IMPORT_INVALID_SHOWN = 10
+
+# Local hour of the daily pass that removes deleted users' rows from the sheet
+COMPACT_HOUR = int(os.getenv('COMPACT_HOUR', '4'))
+
+# Per-user command limits as command=burst/seconds, admins are exempt
+THROTTLE_LIMITS = os.getenv('THROTTLE_LIMITS', 'register=3/60,done=5/60,mystatus=3/60,leaderboard=5/60')
+# How long a user's repeated command is answered with their previous reply
+RESPONSE_CACHE_SECONDS = float(os.getenv('RESPONSE_CACHE_SECONDS', '15'))
+
+def shard_for_user(user_id, num_shards):
+    """Map a Telegram user ID to its shard number"""
+    try:
+        return int(user_id) % num_shards
+    except (TypeError, ValueError):
+        return 0
+
+class SingleFlight:
+    """Share one in-flight call, and its result for a short while, between callers
+    
+    Concurrent callers asking for the same key wait for the first caller's
+    fetch instead of starting their own. The result stays fresh for ttl
+    seconds; invalidate() drops it, and fetches already in flight neither
+    cache what they read before the change nor get joined by later callers.
+    """
+    
+    class Flight:
+        def __init__(self, generation):
+            # Generation the fetch started in, older flights are never joined
+            self.generation = generation
+            self.done = threading.Event()
+            self.value = None
+            self.error = None
+    
+    def __init__(self, ttl):
+        self.ttl = ttl
+        self.lock = threading.Lock()
+        self.results = {}
+        self.flights = {}
+        self.generation = 0
+    
+    def do(self, key, fn):
+        """Return fn()'s result, sharing it with concurrent callers for the same key"""
+        with self.lock:
+            cached = self.results.get(key)
+            if cached and time.monotonic() - cached[0] < self.ttl:
+                return cached[1]
+            flight = self.flights.get(key)
+            leader = flight is None or flight.generation != self.generation
+            if leader:
+                flight = self.flights[key] = self.Flight(self.generation)
+        if not leader:
+            flight.done.wait()
+            if flight.error:
+                raise flight.error
+            return flight.value
+        try:
+            flight.value = fn()
+        except Exception as e:
+            flight.error = e
+            raise
+        finally:
+            with self.lock:
+                if self.flights.get(key) is flight:
+                    del self.flights[key]
+                if flight.error is None and flight.generation == self.generation:
+                    self.results[key] = (time.monotonic(), flight.value)
+            flight.done.set()
+        return flight.value
+    
+    def invalidate(self):
+        """Forget cached results after a write"""
+        with self.lock:
+            self.generation += 1
+            self.results.clear()
+
+class Group(Enum):
+    FINALIST = 'Finalist'
+    SENIOR = 'Senior'
+    JUNIOR = 'Junior'
+
+class Status(Enum):
+    ACTIVE = 'Active'
+    ELIMINATED = 'Eliminated'
+    # Tombstone of a deleted user, the row is removed by the next compaction
+    DELETED = 'Deleted'
+
+# Default task catalog. Bits must stay stable once used, so add new tasks at the end.
+# legacy_column is the old per-task sheet column, read when Task_State is still empty.
+DEFAULT_TASK_CATALOG = [
+    {'id': 'daily1', 'label': 'Daily 1', 'period': 'daily', 'points': 3, 'legacy_column': 'Daily1_Last'},
+    {'id': 'daily2', 'label': 'Daily 2', 'period': 'daily', 'points': 3, 'legacy_column': 'Daily2_Last'},
+    {'id': 'daily3', 'label': 'Daily 3', 'period': 'daily', 'points': 3, 'legacy_column': 'Daily3_Last'},
+    {'id': 'weekly1', 'label': 'Weekly 1', 'period': 'weekly', 'points': 5, 'legacy_column': 'Weekly1_Week'},
+    {'id': 'weekly2', 'label': 'Weekly 2', 'period': 'weekly', 'points': 5, 'legacy_column': 'Weekly2_Week'}
+]
+TASK_STATE_COLUMN = 'Task_State'
+# Day of each task's last completion, kept across periods for /admin_user_stats
+TASK_LAST_COLUMN = 'Task_Last'
+# update_id of the last queued command applied to a row, written with the change itself
+LAST_UPDATE_COLUMN = 'Last_Update_ID'
+
+def day_ordinal(day):
+    """Day number of a date, comparable as an int"""
+    return day.toordinal()
+
+def week_ordinal(day):
+    """Number of the Monday-based week a date falls in"""
+    return (day.toordinal() - 1) // 7
+
+def parse_day(value):
+    """Parse a YYYY-MM-DD cell into a day ordinal, 0 when empty"""
+    value = str(value).strip()
+    if not value:
+        return 0
+    for fmt in ("%Y-%m-%d", "%m/%d/%Y"):
+        try:
+            return day_ordinal(datetime.strptime(value, fmt).date())
+        except ValueError:
+            pass
+    raise ValueError(f"bad date {value!r}")
+
+def parse_week(value):
+    """Parse a YYYY-W## cell into a week ordinal, 0 when empty"""
+    value = str(value).strip()
+    if not value:
+        return 0
+    year, _, week = value.partition('-W')
+    return week_ordinal(date.fromisocalendar(int(year), int(week), 1))
+
+class Task:
+    """One catalog task: a bit in its period's completion mask"""
+    __slots__ = ('id', 'label', 'period', 'days', 'points', 'bit', 'legacy_column')
+    
+    def __init__(self, task_id, label, period, points, bit, days=None, legacy_column=None):
+        if period not in ('daily', 'weekly', 'custom'):
+            raise ValueError(f"Task {task_id}: unknown period {period!r}")
+        if period == 'custom' and not (isinstance(days, int) and days > 0):
+            raise ValueError(f"Task {task_id}: custom period needs a positive 'days'")
+        self.id = task_id
+        self.label = label
+        self.period = period
+        self.days = days
+        self.points = points
+        self.bit = bit
+        self.legacy_column = legacy_column
+    
+    @property
+    def period_key(self):
+        """Tasks sharing a period share one mask"""
+        return f"{self.days}d" if self.period == 'custom' else self.period
+    
+    def stamp(self, day):
+        """Number of the period that day falls in"""
+        if self.period == 'daily':
+            return day_ordinal(day)
+        if self.period == 'weekly':
+            return week_ordinal(day)
+        return day_ordinal(day) // self.days
+    
+    def describe_period(self):
+        if self.period == 'daily':
+            return "today"
+        if self.period == 'weekly':
+            return "this week"
+        return f"in this {self.days}-day period"
+    
+    def format_day(self, day):
+        """Show a completion day the way the task is counted: ISO week for weekly tasks"""
+        day = date.fromordinal(day)
+        if self.period == 'weekly':
+            year, week, _ = day.isocalendar()
+            return f"{year}-W{week:02d}"
+        return day.isoformat()
+    
+    def describe_frequency(self):
+        if self.period == 'daily':
+            return "per day"
+        if self.period == 'weekly':
+            return "per week"
+        return f"per {self.days} days"
+
+def load_task_catalog():
+    """Build the task catalog from TASK_CATALOG (JSON list) or the default"""
+    raw = os.getenv('TASK_CATALOG')
+    entries = json.loads(raw) if raw else DEFAULT_TASK_CATALOG
+    catalog = {}
+    bits = set()
+    for i, entry in enumerate(entries):
+        task = Task(
+            entry['id'].lower(),
+            entry.get('label', entry['id']),
+            entry['period'],
+            int(entry['points']),
+            int(entry.get('bit', i)),
+            entry.get('days'),
+            entry.get('legacy_column')
+        )
+        if task.id in catalog or task.bit in bits:
+            raise ValueError(f"Duplicate task id or bit in catalog: {task.id}")
+        catalog[task.id] = task
+        bits.add(task.bit)
+    return catalog
+
+TASK_CATALOG = load_task_catalog()
+
+def current_stamps(day=None):
+    """Current period stamp for every period key in the catalog"""
+    day = day or date.today()
+    return {task.period_key: task.stamp(day) for task in TASK_CATALOG.values()}
+
+def parse_task_state(value):
+    """Parse 'daily@739543:5;weekly@105649:2' into {period_key: (stamp, mask)}"""
+    state = {}
+    for part in str(value).split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        try:
+            key, _, rest = part.partition('@')
+            stamp, _, mask = rest.partition(':')
+            state[key] = (int(stamp), int(mask))
+        except ValueError:
+            raise ValueError(f"bad {TASK_STATE_COLUMN} {value!r}")
+    return state
+
+def format_task_state(state):
+    return ';'.join(f"{key}@{stamp}:{mask}" for key, (stamp, mask) in sorted(state.items()) if mask)
+
+def parse_task_last(value):
+    """Parse 'daily1:739543;weekly1:739540' into {task_id: day ordinal}"""
+    last = {}
+    for part in str(value).split(';'):
+        part = part.strip()
+        if not part:
+            continue
+        task_id, _, day = part.partition(':')
+        try:
+            last[task_id] = int(day)
+        except ValueError:
+            raise ValueError(f"bad {TASK_LAST_COLUMN} {value!r}")
+    return last
+
+def format_task_last(last):
+    return ';'.join(f"{task_id}:{day}" for task_id, day in sorted(last.items()))
+
+def legacy_task_last(record):
+    """Last completion days read from the old per-task date/week columns"""
+    last = {}
+    for task in TASK_CATALOG.values():
+        if not task.legacy_column or task.period == 'custom':
+            continue
+        value = record.get(task.legacy_column, '')
+        try:
+            if task.period == 'daily':
+                day = parse_day(value)
+            else:
+                # Monday of the stored week
+                week = parse_week(value)
+                day = week * 7 + 1 if week else 0
+        except ValueError:
+            continue
+        if day:
+            last[task.id] = day
+    return last
+
+def legacy_task_state(record):
+    """Completion masks rebuilt from the old per-task date/week columns"""
+    today = date.today()
+    state = {}
+    for task in TASK_CATALOG.values():
+        if not task.legacy_column or task.period == 'custom':
+            continue
+        value = record.get(task.legacy_column, '')
+        try:
+            last = parse_day(value) if task.period == 'daily' else parse_week(value)
+        except ValueError:
+            # Dates in another locale's format count as not done, not as a broken row
+            continue
+        stamp = task.stamp(today)
+        if last == stamp:
+            mask = state.get(task.period_key, (stamp, 0))[1]
+            state[task.period_key] = (stamp, mask | 1 << task.bit)
+    return state
+
+class Challenger:
+    """One parsed roster row"""
+    __slots__ = (
+        'row_num', 'user_id', 'name', 'group', 'points', 'strikes', 'status', 'task_state', 'last_done', 'last_update'
+    )
+    
+    def __init__(self, row_num, user_id, name, group, points=0, strikes=0,
+                 status=Status.ACTIVE, task_state=None, last_done=None, last_update=0):
+        self.row_num = row_num
+        self.user_id = user_id
+        self.name = name
+        self.group = group
+        self.points = points
+        self.strikes = strikes
+        self.status = status
+        # {period_key: (period stamp, completion bitmask)}
+        self.task_state = task_state or {}
+        # {task_id: day ordinal of the last completion}
+        self.last_done = last_done or {}
+        self.last_update = last_update
+    
+    @classmethod
+    def from_record(cls, row_num, record):
+        """Build from a get_all_records() dict, raises ValueError on malformed rows"""
+        try:
+            user_id = int(record.get('User_ID', ''))
+        except (TypeError, ValueError):
+            raise ValueError(f"bad User_ID {record.get('User_ID')!r}")
+        task_state = parse_task_state(record.get(TASK_STATE_COLUMN, ''))
+        if not task_state:
+            task_state = legacy_task_state(record)
+        last_done = parse_task_last(record.get(TASK_LAST_COLUMN, ''))
+        if not last_done:
+            last_done = legacy_task_last(record)
+        return cls(
+            row_num,
+            user_id,
+            str(record.get('Name', 'Unknown')),
+            Group(str(record.get('Group', '')).strip().capitalize()),
+            int(record.get('Current_Points') or 0),
+            int(record.get('Strikes') or 0),
+            Status(str(record.get('Status', 'Active')).strip().capitalize()),
+            task_state,
+            last_done,
+            int(record.get(LAST_UPDATE_COLUMN) or 0)
+        )
+    
+    @property
+    def is_active(self):
+        return self.status is Status.ACTIVE
+    
+    def is_done(self, task, stamps=None):
+        """Check the task's bit in its mask for the current period"""
+        stamps = stamps or current_stamps()
+        stamp, mask = self.task_state.get(task.period_key, (None, 0))
+        return stamp == stamps[task.period_key] and mask >> task.bit & 1 == 1
+    
+    def with_task_done(self, task, stamps=None):
+        """Task state with the task's bit set, masks of past periods dropped"""
+        stamps = stamps or current_stamps()
+        state = {key: value for key, value in self.task_state.items()
+                 if value[0] == stamps.get(key)}
+        stamp, mask = state.get(task.period_key, (stamps[task.period_key], 0))
+        state[task.period_key] = (stamp, mask | 1 << task.bit)
+        return state
+
+class Roster:
+    """Parsed challengers of one shard, indexed by user ID"""
+    __slots__ = ('challengers', 'by_id', 'invalid_rows', 'invalid_ids')
+    
+    def __init__(self, challengers, invalid_rows=(), invalid_ids=()):
+        self.challengers = challengers
+        self.by_id = {challenger.user_id: challenger for challenger in challengers}
+        self.invalid_rows = list(invalid_rows)
+        # Users whose row has a readable User_ID but failed to parse, still registered
+        self.invalid_ids = set(invalid_ids)
+    
+    @classmethod
+    def from_records(cls, records, owns_user=None):
+        """Parse get_all_records() output once, keeping the users owns_user accepts"""
+        return cls.from_rows(enumerate(records, start=2), owns_user)
+    
+    @classmethod
+    def from_rows(cls, rows, owns_user=None):
+        """Parse (row number, record) pairs, keeping the users owns_user accepts
+        
+        owns_user gets the raw User_ID cell, so other shards' rows are
+        skipped before they are parsed.
+        """
+        challengers = []
+        invalid_rows = []
+        invalid_ids = []
+        for row_num, record in rows:
+            if not any(str(value).strip() for value in record.values()):
+                continue
+            if owns_user is not None and not owns_user(record.get('User_ID')):
+                continue
+            try:
+                challenger = Challenger.from_record(row_num, record)
+            except ValueError as e:
+                if str(record.get('Status', '')).strip().capitalize() == Status.DELETED.value:
+                    continue
+                invalid_rows.append((row_num, str(e)))
+                try:
+                    invalid_ids.append(int(record.get('User_ID', '')))
+                except (TypeError, ValueError):
+                    pass
+                continue
+            if challenger.status is not Status.DELETED:
+                challengers.append(challenger)
+        if invalid_rows:
+            logger.warning(f"Skipped {len(invalid_rows)} malformed sheet rows: {invalid_rows[:5]}")
+        return cls(challengers, invalid_rows, invalid_ids)
+    
+    def __iter__(self):
+        return iter(self.challengers)
+    
+    def __len__(self):
+        return len(self.challengers)
+    
+    def __contains__(self, user_id):
+        """Check if a user has a row, readable or not"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return False
+        return user_id in self.by_id or user_id in self.invalid_ids
+    
+    def is_invalid(self, user_id):
+        """Check if a user's row is there but could not be parsed"""
+        try:
+            user_id = int(user_id)
+        except (TypeError, ValueError):
+            return False
+        return user_id in self.invalid_ids and user_id not in self.by_id
+    
+    def get(self, user_id):
+        try:
+            return self.by_id.get(int(user_id))
+        except (TypeError, ValueError):
+            return None
+    
+    def find_by_name(self, name):
+        """Find a challenger by name (case insensitive)"""
+        name = name.lower()
+        return next((challenger for challenger in self.challengers if challenger.name.lower() == name), None)
+
 class SGIBot:
-    def __init__(self, spreadsheet_id, admin_user_ids):
+    # Methods that never write, these may run concurrently
+    READ_METHODS = {
+        'get_challenger_status', 'get_rankings', 'get_leaderboard',
+        'get_user_stats', 'get_admin_counts', 'get_admin_stats', 'find_challenger_by_name',
+        'start_export'
+    }
+    # Methods that page through an export snapshot and never touch the sheet
+    EXPORT_METHODS = {'get_roster_chunk', 'end_export'}
+    
+    def __init__(self, spreadsheet_id, admin_user_ids, shard_id=0, num_shards=1):
         self.spreadsheet_id = spreadsheet_id
         self.admin_user_ids = set(map(int, admin_user_ids.split(',')))
+        self.spreadsheet = None
         self.sheet = None
         self.challenge_active = True
+        # Each worker process only owns the users that hash to its shard
+        self.shard_id = shard_id
+        self.num_shards = num_shards
+        self.column_indices = None
+        # Coalesces concurrent identical reads, writes are serialized
+        self.reads = SingleFlight(READ_CACHE_SECONDS)
+        self.write_lock = threading.Lock()
+        # Roster of the write running in this thread, writes never share a read
+        self.local = threading.local()
+        # Last rows the receiver sent in sharded mode, as (version, roster)
+        self.snapshot = (None, None)
+        # Open roster exports: export_id -> (stamps, iterator over matching challengers)
+        self.exports = {}
         self.setup_google_sheets()
     
     def setup_google_sheets(self):
         """Initialize Google Sheets connection"""
         try:
-            self.sheet = gc.open_by_key(self.spreadsheet_id).sheet1
+            self.spreadsheet = gc.open_by_key(self.spreadsheet_id)
+            self.sheet = self.spreadsheet.sheet1
             logger.info("Google Sheets connection established")
         except Exception as e:
             logger.error(f"Failed to setup Google Sheets: {e}")
@@ -65,64 +585,225 @@ class SGIBot:
         """Check if user is an admin"""
         return user_id in self.admin_user_ids
     
-    def get_current_date_string(self):
-        """Get current date as string in YYYY-MM-DD format"""
-        return date.today().strftime("%Y-%m-%d")
+    def run(self, method, *args):
+        """Run a bot method by name, dropping cached reads after writes"""
+        if method in self.READ_METHODS or method in self.EXPORT_METHODS:
+            return getattr(self, method)(*args)
+        with self.write_lock:
+            self.local.writing = True
+            try:
+                return getattr(self, method)(*args)
+            finally:
+                self.local.writing = False
+                self.local.roster = None
+                self.reads.invalidate()
     
-    def get_current_week_string(self):
-        """Get current week as string in YYYY-W## format"""
-        today = date.today()
-        year, week, _ = today.isocalendar()
-        return f"{year}-W{week:02d}"
+    def owns_user(self, user_id):
+        """Check if a user, or a raw User_ID cell, belongs to this bot's shard"""
+        return shard_for_user(user_id, self.num_shards) == self.shard_id
+    
+    def load_roster(self):
+        return Roster.from_records(self.sheet.get_all_records(), self.owns_user)
+    
+    def run_on_rows(self, version, rows, method, *args):
+        """Run a read method on this shard's rows, as fetched by the receiver
+        
+        rows is None when the receiver already sent this version, the
+        roster parsed from it then is reused.
+        """
+        if method not in self.READ_METHODS:
+            raise ValueError(f"{method} is not a read method")
+        if rows is not None:
+            self.snapshot = (version, Roster.from_rows(rows))
+        elif self.snapshot[0] != version:
+            raise RuntimeError(f"Shard {self.shard_id} has no rows for version {version}")
+        self.local.roster = self.snapshot[1]
+        try:
+            return getattr(self, method)(*args)
+        finally:
+            self.local.roster = None
+    
+    def get_roster(self):
+        """This shard's parsed roster
+        
+        Readers share one coalesced copy unless the receiver sent the rows
+        along. A write loads its own copy once, so it never acts on rows
+        read before an earlier write landed.
+        """
+        roster = getattr(self.local, 'roster', None)
+        if roster is not None:
+            return roster
+        if getattr(self.local, 'writing', False):
+            self.local.roster = self.load_roster()
+            return self.local.roster
+        return self.reads.do('roster', self.load_roster)
+    
+    def get_column_indices(self):
+        """Map header names to column numbers (read once, headers don't move)"""
+        if self.column_indices is None:
+            headers = self.sheet.row_values(1)
+            self.column_indices = {header: i for i, header in enumerate(headers, start=1)}
+        return self.column_indices
+    
+    def run_command(self, update_id, method, *args):
+        """Run a queued write once, keyed by its Telegram update_id
+        
+        The write stores update_id in the row's Last_Update_ID cell in the
+        same API call as its change. A replay after a crash between the
+        sheet write and the queue update is recognised and skipped.
+        Every queued method takes the target user ID first.
+        """
+        try:
+            challenger = self.find_challenger(args[0])
+        except STORAGE_ERRORS:
+            # Same retryable reply the write itself gives during an outage
+            return False, REGISTER_ERROR_MSG if method == 'register_challenger' else DB_ERROR_MSG
+        if challenger and challenger.last_update == update_id:
+            logger.info(f"Update {update_id} ({method}) already applied to user {args[0]}, skipping")
+            return True, ALREADY_APPLIED_MSG
+        self.local.update_id = update_id
+        try:
+            return getattr(self, method)(*args)
+        finally:
+            self.local.update_id = None
+    
+    def stamp_update(self, values):
+        """Add the running command's update_id to the cells a write changes"""
+        update_id = getattr(self.local, 'update_id', None)
+        if update_id is None:
+            return values
+        self.ensure_column(LAST_UPDATE_COLUMN)
+        return {**values, LAST_UPDATE_COLUMN: update_id}
+    
+    def update_row_cells(self, row_num, values):
+        """Write several cells of one row in a single API call"""
+        values = self.stamp_update(values)
+        columns = self.get_column_indices()
+        cells = [gspread.Cell(row_num, columns[header], value) for header, value in values.items()]
+        self.sheet.update_cells(cells, value_input_option='USER_ENTERED')
+    
+    def ensure_column(self, header):
+        """Add a header after the last column if the sheet doesn't have it yet
+        
+        Headers and the grid width are re-read before adding anything,
+        another worker process may have added the column already.
+        """
+        columns = self.get_column_indices()
+        if header in columns:
+            return columns[header]
+        self.column_indices = None
+        columns = self.get_column_indices()
+        if header not in columns:
+            col = max(columns.values(), default=0) + 1
+            col_count = self.fetch_col_count()
+            if col > col_count:
+                self.sheet.add_cols(col - col_count)
+            self.sheet.update_cell(1, col, header)
+            columns[header] = col
+            logger.info(f"Added sheet column {header}")
+        return columns[header]
+    
+    def fetch_col_count(self):
+        """Grid width from the API, sheet.col_count only knows this process's changes"""
+        metadata = self.spreadsheet.fetch_sheet_metadata({'fields': 'sheets.properties'})
+        for sheet in metadata['sheets']:
+            if sheet['properties']['sheetId'] == self.sheet.id:
+                return sheet['properties']['gridProperties']['columnCount']
+        return self.sheet.col_count
+    
+    def prepare_columns(self):
+        """Add new columns up front, from one process, before any worker needs them"""
+        try:
+            self.ensure_column(TASK_STATE_COLUMN)
+            self.ensure_column(TASK_LAST_COLUMN)
+            self.ensure_column(LAST_UPDATE_COLUMN)
+            return True
+        except Exception as e:
+            logger.error(f"Error preparing sheet columns: {e}")
+            return False
+    
+    def build_row(self, values):
+        """Lay out a new row by header name, unknown headers stay empty"""
+        columns = self.get_column_indices()
+        row = [''] * max(columns.values(), default=0)
+        for header, value in values.items():
+            if header in columns:
+                row[columns[header] - 1] = value
+        return row
     
     def find_challenger(self, user_id):
         """Find challenger by Telegram user ID"""
         try:
-            records = self.sheet.get_all_records()
-            for i, record in enumerate(records, start=2):
-                if str(record.get('User_ID', '')) == str(user_id):
-                    return i, record
-            return None, None
+            return self.get_roster().get(user_id)
         except Exception as e:
+            # Let callers report an outage instead of "not registered"
             logger.error(f"Error finding challenger {user_id}: {e}")
-            return None, None
+            raise
+    
+    def missing_challenger_msg(self, user_id):
+        """Tell a user with no usable record whether to register or ask an admin"""
+        if self.get_roster().is_invalid(user_id):
+            return RECORD_ERROR_MSG
+        return "You are not registered. Use /register to join the challenge"
     
     def find_challenger_by_name(self, name):
         """Find challenger by name (case insensitive)"""
         try:
-            records = self.sheet.get_all_records()
-            for record in records:
-                if record.get('Name', '').lower() == name.lower():
-                    return record
-            return None
+            return self.get_roster().find_by_name(name)
         except Exception as e:
             logger.error(f"Error finding challenger by name {name}: {e}")
             return None
     
+    def start_export(self, export_id, group=None, status=None):
+        """Take the roster snapshot an export pages through, False on error"""
+        try:
+            matching = [
+                challenger for challenger in self.get_roster()
+                if (group is None or challenger.group.value == group)
+                and (status is None or challenger.status.value == status)
+            ]
+            self.exports[export_id] = (current_stamps(), iter(matching))
+            return True
+        except Exception as e:
+            logger.error(f"Error exporting roster: {e}")
+            return False
+    
+    def get_roster_chunk(self, export_id, limit):
+        """Next chunk of export rows from the export's snapshot, None if it is not open"""
+        if export_id not in self.exports:
+            return None
+        stamps, matching = self.exports[export_id]
+        return [{
+            'user_id': challenger.user_id,
+            'name': challenger.name,
+            'group': challenger.group.value,
+            'points': challenger.points,
+            'strikes': challenger.strikes,
+            'status': challenger.status.value,
+            'tasks_done': ' '.join(task.id for task in TASK_CATALOG.values() if challenger.is_done(task, stamps))
+        } for challenger in itertools.islice(matching, limit)]
+    
+    def end_export(self, export_id):
+        """Drop an export's snapshot"""
+        self.exports.pop(export_id, None)
+        return True
+    
     def register_challenger(self, user_id, first_name, group):
         """Register a new challenger"""
         try:
-            # Check if already registered
-            row_num, existing = self.find_challenger(user_id)
-            if existing:
+            # Check if already registered, a malformed row still counts
+            if user_id in self.get_roster():
                 return False, "You are already registered for the challenge"
             
-            # Add new challenger with updated column structure
-            new_row = [
-                first_name,           # Name
-                str(user_id),         # User_ID
-                group,                # Group (Senior/Junior/Finalist)
-                0,                    # Current_Points
-                0,                    # Strikes
-                "Active",             # Status
-                "",                   # Daily1_Last (last completion date)
-                "",                   # Daily2_Last (last completion date)
-                "",                   # Daily3_Last (last completion date)
-                "",                   # Weekly1_Week (week when completed)
-                ""                    # Weekly2_Week (week when completed)
-            ]
-            
-            self.sheet.append_row(new_row)
+            # Add new challenger, task columns start empty
+            self.sheet.append_row(self.build_row(self.stamp_update({
+                'Name': first_name,
+                'User_ID': str(user_id),
+                'Group': group,
+                'Current_Points': 0,
+                'Strikes': 0,
+                'Status': Status.ACTIVE.value
+            })))
             logger.info(f"Registered new challenger: {first_name} (ID: {user_id})")
             
             # Generate congratulatory message based on group
@@ -136,9 +817,30 @@ class SGIBot:
                 congrats_msg = f"Welcome {first_name}! You're registered in the {group} group"
             
             return True, f"Welcome {first_name}! You're registered in the {group} group.\n\n{congrats_msg}"
-        except Exception as e:
+        except STORAGE_ERRORS as e:
             logger.error(f"Error registering challenger: {e}")
-            return False, "Unable to register. Please try again"
+            return False, REGISTER_ERROR_MSG
+    
+    def import_challengers(self, rows):
+        """Register many challengers with one append, returns (inserted, skipped) or None on error"""
+        try:
+            # Dedupe against the roster index instead of a lookup per row
+            roster = self.get_roster()
+            new_rows = [row for row in rows if row['user_id'] not in roster]
+            if new_rows:
+                self.sheet.append_rows([self.build_row({
+                    'Name': row['name'],
+                    'User_ID': str(row['user_id']),
+                    'Group': row['group'],
+                    'Current_Points': 0,
+                    'Strikes': 0,
+                    'Status': Status.ACTIVE.value
+                }) for row in new_rows])
+            logger.info(f"Imported {len(new_rows)} challengers, {len(rows) - len(new_rows)} already registered")
+            return len(new_rows), len(rows) - len(new_rows)
+        except Exception as e:
+            logger.error(f"Error importing challengers: {e}")
+            return None
     
     def update_task_completion(self, user_id, task_type):
         """Update task completion for a challenger"""
@@ -146,442 +848,344 @@ class SGIBot:
             if not self.challenge_active:
                 return False, "Challenge is being reset. Try again in a few minutes"
             
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
-                return False, "You are not registered. Use /register to join the challenge"
-            if challenger.get('Status') != 'Active':
+                return False, self.missing_challenger_msg(user_id)
+            if not challenger.is_active:
                 return False, "You have been eliminated from the challenge"
-            
-            current_date = self.get_current_date_string()
-            current_week = self.get_current_week_string()
-            
-            # Map task types to new column names
-            task_column_mapping = {
-                'Daily1': 'Daily1_Last',
-                'Daily2': 'Daily2_Last',
-                'Daily3': 'Daily3_Last',
-                'Weekly1': 'Weekly1_Week',
-                'Weekly2': 'Weekly2_Week'
-            }
-            if task_type not in task_column_mapping:
+            task = TASK_CATALOG.get(task_type.lower())
+            if not task:
                 return False, "Invalid task type"
             
-            column_name = task_column_mapping[task_type]
-            last_completion = challenger.get(column_name, '')
+            # Bit test against the mask of the current day/week/period
+            stamps = current_stamps()
+            if challenger.is_done(task, stamps):
+                return False, f"You already completed {task.id} {task.describe_period()}"
             
-            # Check if task can be completed
-            if 'Daily' in task_type:
-                # Daily tasks: check if completed today
-                if last_completion == current_date:
-                    return False, f"You already completed {task_type.lower()} today"
-                points_to_add = 3
-                new_completion_value = current_date
-            else:
-                # Weekly tasks: check if completed this week
-                if last_completion == current_week:
-                    return False, f"You already completed {task_type.lower()} this week"
-                points_to_add = 5
-                new_completion_value = current_week
-            
-            # Find column indices
-            headers = self.sheet.row_values(1)
-            task_col = None
-            points_col = None
-            for i, header in enumerate(headers, start=1):
-                if header == column_name:
-                    task_col = i
-                elif header == 'Current_Points':
-                    points_col = i
-            if not task_col or not points_col:
+            if 'Current_Points' not in self.get_column_indices():
                 return False, "System error. Please contact admin"
+            self.ensure_column(TASK_STATE_COLUMN)
+            self.ensure_column(TASK_LAST_COLUMN)
             
-            # Update task completion date/week
-            self.sheet.update_cell(row_num, task_col, new_completion_value)
+            # Write the packed task state, completion day and points together
+            new_points = challenger.points + task.points
+            self.update_row_cells(challenger.row_num, {
+                TASK_STATE_COLUMN: format_task_state(challenger.with_task_done(task, stamps)),
+                TASK_LAST_COLUMN: format_task_last({**challenger.last_done, task.id: day_ordinal(date.today())}),
+                'Current_Points': new_points
+            })
             
-            # Calculate and update points
-            current_points = int(challenger.get('Current_Points', 0))
-            new_points = current_points + points_to_add
-            self.sheet.update_cell(row_num, points_col, new_points)
-            
-            logger.info(f"User {user_id} completed {task_type}, added {points_to_add} points")
-            return True, f"Task completed. +{points_to_add} points. Total: {new_points}"
-        except Exception as e:
+            logger.info(f"User {user_id} completed {task.id}, added {task.points} points")
+            return True, f"Task completed. +{task.points} points. Total: {new_points}"
+        except STORAGE_ERRORS as e:
             logger.error(f"Error updating task for {user_id}: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
     def get_challenger_status(self, user_id):
         """Get challenger's current status"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
-                return "You are not registered. Use /register to join the challenge"
-            
-            name = challenger.get('Name', 'Unknown')
-            group = challenger.get('Group', 'Unknown')
-            points = challenger.get('Current_Points', 0)
-            strikes = challenger.get('Strikes', 0)
-            status = challenger.get('Status', 'Active')
-            
-            current_date = self.get_current_date_string()
-            current_week = self.get_current_week_string()
-            
-            # Check task completion status for today/this week
-            daily1_done = challenger.get('Daily1_Last') == current_date
-            daily2_done = challenger.get('Daily2_Last') == current_date
-            daily3_done = challenger.get('Daily3_Last') == current_date
-            weekly1_done = challenger.get('Weekly1_Week') == current_week
-            weekly2_done = challenger.get('Weekly2_Week') == current_week
+                return self.missing_challenger_msg(user_id)
             
+            stamps = current_stamps()
+            tasks_msg = format_task_lines(
+                "Tasks",
+                lambda task: f"{task.label} ({task.points} pts): {'Done' if challenger.is_done(task, stamps) else 'Pending'}"
+            )
             status_msg = f"""Your Progress:
 
-Name: {name}
-Group: {group}
-Points: {points}
-Strikes: {strikes}/2
-Status: {status}
-
-Today's Tasks (3 pts each):
-Daily 1: {'Done' if daily1_done else 'Pending'}
-Daily 2: {'Done' if daily2_done else 'Pending'}
-Daily 3: {'Done' if daily3_done else 'Pending'}
+Name: {challenger.name}
+Group: {challenger.group.value}
+Points: {challenger.points}
+Strikes: {challenger.strikes}/2
+Status: {challenger.status.value}
 
-This Week's Tasks (5 pts each):
-Weekly 1: {'Done' if weekly1_done else 'Pending'}
-Weekly 2: {'Done' if weekly2_done else 'Pending'}"""
+{tasks_msg}"""
             return status_msg
         except Exception as e:
             logger.error(f"Error getting status for {user_id}: {e}")
-            return "Unable to connect to database. Please try again in a moment"
+            return DB_ERROR_MSG
     
-    def get_leaderboard(self):
-        """Generate leaderboard"""
+    def build_rankings(self):
+        """Rank the active users of each group in this shard"""
+        # Separate by groups and filter active users
+        groups = {group: [] for group in LEADERBOARD_GROUPS}
+        for challenger in self.get_roster():
+            if challenger.is_active:
+                groups[challenger.group.value].append({
+                    'user_id': challenger.user_id,
+                    'name': challenger.name,
+                    'points': challenger.points
+                })
+        # Sort by points
+        for users in groups.values():
+            users.sort(key=lambda x: x['points'], reverse=True)
+        return groups
+    
+    def get_rankings(self):
+        """Get the ranked active users of each group in this shard"""
         try:
-            records = self.sheet.get_all_records()
-            # Separate by groups and filter active users
-            senior_users = []
-            junior_users = []
-            finalist_users = []
-            for record in records:
-                if record.get('Status') != 'Active':
-                    continue
-                user_data = {
-                    'name': record.get('Name', 'Unknown'),
-                    'points': int(record.get('Current_Points', 0))
-                }
-                if record.get('Group') == 'Senior':
-                    senior_users.append(user_data)
-                elif record.get('Group') == 'Junior':
-                    junior_users.append(user_data)
-                elif record.get('Group') == 'Finalist':
-                    finalist_users.append(user_data)
-            # Sort by points
-            senior_users.sort(key=lambda x: x['points'], reverse=True)
-            junior_users.sort(key=lambda x: x['points'], reverse=True)
-            finalist_users.sort(key=lambda x: x['points'], reverse=True)
-            # Build leaderboard message
-            msg = "SGI Challenge Leaderboard:\n\n"
-            if finalist_users:
-                msg += "Finalist Group:\n"
-                for i, user in enumerate(finalist_users[:10], 1):
-                    msg += f"{i}. {user['name']}: {user['points']} pts\n"
-                msg += "\n"
-            if senior_users:
-                msg += "Senior Group:\n"
-                for i, user in enumerate(senior_users[:10], 1):
-                    msg += f"{i}. {user['name']}: {user['points']} pts\n"
-                msg += "\n"
-            if junior_users:
-                msg += "Junior Group:\n"
-                for i, user in enumerate(junior_users[:10], 1):
-                    msg += f"{i}. {user['name']}: {user['points']} pts\n"
-            return msg if senior_users or junior_users or finalist_users else "No active challengers found"
+            return self.reads.do('rankings', self.build_rankings)
         except Exception as e:
             logger.error(f"Error generating leaderboard: {e}")
-            return "Unable to connect to database. Please try again in a moment"
+            return None
+    
+    def get_leaderboard(self):
+        """Generate leaderboard"""
+        groups = self.get_rankings()
+        if groups is None:
+            return DB_ERROR_MSG
+        return format_leaderboard(groups)
     
     def add_strike(self, user_id, reason):
         """Add strike to a user (admin only)"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return False, "User not found"
             
-            current_strikes = int(challenger.get('Strikes', 0))
-            new_strikes = current_strikes + 1
-            
-            # Find column indices
-            headers = self.sheet.row_values(1)
-            strikes_col = None
-            status_col = None
-            for i, header in enumerate(headers, start=1):
-                if header == 'Strikes':
-                    strikes_col = i
-                elif header == 'Status':
-                    status_col = i
-            
-            # Update strikes
-            self.sheet.update_cell(row_num, strikes_col, new_strikes)
+            new_strikes = challenger.strikes + 1
             
             # Check for elimination
             if new_strikes >= 2:
-                self.sheet.update_cell(row_num, status_col, 'Eliminated')
+                self.update_row_cells(challenger.row_num, {'Strikes': new_strikes, 'Status': Status.ELIMINATED.value})
                 status_msg = f"Strike added. User eliminated (2/2 strikes). Reason: {reason}"
             else:
+                self.update_row_cells(challenger.row_num, {'Strikes': new_strikes})
                 status_msg = f"Strike added ({new_strikes}/2). Reason: {reason}"
             
             logger.info(f"Strike added to user {user_id}: {reason}")
             return True, status_msg
-        except Exception as e:
+        except STORAGE_ERRORS as e:
             logger.error(f"Error adding strike: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
     def remove_strike(self, user_id):
         """Remove strike from a user (admin only)"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return False, "User not found"
             
-            current_strikes = int(challenger.get('Strikes', 0))
-            if current_strikes <= 0:
+            if challenger.strikes <= 0:
                 return False, "User has no strikes to remove"
             
-            new_strikes = current_strikes - 1
-            
-            # Find column indices
-            headers = self.sheet.row_values(1)
-            strikes_col = None
-            status_col = None
-            for i, header in enumerate(headers, start=1):
-                if header == 'Strikes':
-                    strikes_col = i
-                elif header == 'Status':
-                    status_col = i
-            
-            # Update strikes
-            self.sheet.update_cell(row_num, strikes_col, new_strikes)
+            new_strikes = challenger.strikes - 1
             
             # If user was eliminated but now has less than 2 strikes, reactivate
-            if challenger.get('Status') == 'Eliminated' and new_strikes < 2:
-                self.sheet.update_cell(row_num, status_col, 'Active')
+            if challenger.status is Status.ELIMINATED and new_strikes < 2:
+                self.update_row_cells(challenger.row_num, {'Strikes': new_strikes, 'Status': Status.ACTIVE.value})
                 status_msg = f"Strike removed ({new_strikes}/2). User reactivated"
             else:
+                self.update_row_cells(challenger.row_num, {'Strikes': new_strikes})
                 status_msg = f"Strike removed ({new_strikes}/2)"
             
             logger.info(f"Strike removed from user {user_id}")
             return True, status_msg
-        except Exception as e:
+        except STORAGE_ERRORS as e:
             logger.error(f"Error removing strike: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
     def get_user_stats(self, user_id):
         """Get detailed stats for a specific user (admin only)"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return "User not found"
             
-            name = challenger.get('Name', 'Unknown')
-            group = challenger.get('Group', 'Unknown')
-            points = challenger.get('Current_Points', 0)
-            strikes = challenger.get('Strikes', 0)
-            status = challenger.get('Status', 'Active')
-            
-            current_date = self.get_current_date_string()
-            current_week = self.get_current_week_string()
-            
-            # Check task completion status
-            daily1_done = challenger.get('Daily1_Last') == current_date
-            daily2_done = challenger.get('Daily2_Last') == current_date
-            daily3_done = challenger.get('Daily3_Last') == current_date
-            weekly1_done = challenger.get('Weekly1_Week') == current_week
-            weekly2_done = challenger.get('Weekly2_Week') == current_week
-            
+            stamps = current_stamps()
+            tasks_msg = format_task_lines(
+                "Tasks",
+                lambda task: f"{task.label}: {'Completed' if challenger.is_done(task, stamps) else 'Pending'}"
+            )
+            last_msg = "\n".join(
+                f"{task.label}: {task.format_day(challenger.last_done[task.id]) if task.id in challenger.last_done else 'Never'}"
+                for task in TASK_CATALOG.values()
+            )
             stats_msg = f"""User Statistics:
 
 User ID: {user_id}
-Name: {name}
-Group: {group}
-Points: {points}
-Strikes: {strikes}/2
-Status: {status}
-
-Today's Tasks:
-Daily 1: {'Completed' if daily1_done else 'Pending'}
-Daily 2: {'Completed' if daily2_done else 'Pending'}
-Daily 3: {'Completed' if daily3_done else 'Pending'}
+Name: {challenger.name}
+Group: {challenger.group.value}
+Points: {challenger.points}
+Strikes: {challenger.strikes}/2
+Status: {challenger.status.value}
 
-This Week's Tasks:
-Weekly 1: {'Completed' if weekly1_done else 'Pending'}
-Weekly 2: {'Completed' if weekly2_done else 'Pending'}
+{tasks_msg}
 
 Last Completions:
-Daily 1: {challenger.get('Daily1_Last', 'Never')}
-Daily 2: {challenger.get('Daily2_Last', 'Never')}
-Daily 3: {challenger.get('Daily3_Last', 'Never')}
-Weekly 1: {challenger.get('Weekly1_Week', 'Never')}
-Weekly 2: {challenger.get('Weekly2_Week', 'Never')}"""
+{last_msg}"""
             return stats_msg
         except Exception as e:
             logger.error(f"Error getting user stats for {user_id}: {e}")
-            return "Unable to connect to database. Please try again in a moment"
+            return DB_ERROR_MSG
     
     def adjust_points(self, user_id, points, action):
         """Add or remove points from a user (admin only)"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return False, "User not found"
             
-            current_points = int(challenger.get('Current_Points', 0))
             if action == "add":
-                new_points = current_points + points
+                new_points = challenger.points + points
                 action_text = "added"
             elif action == "remove":
-                new_points = max(0, current_points - points)  # Don't allow negative points
+                new_points = max(0, challenger.points - points)  # Don't allow negative points
                 action_text = "removed"
             else:
                 return False, "Invalid action. Use 'add' or 'remove'"
             
-            # Find points column
-            headers = self.sheet.row_values(1)
-            points_col = None
-            for i, header in enumerate(headers, start=1):
-                if header == 'Current_Points':
-                    points_col = i
-                    break
-            if not points_col:
+            if 'Current_Points' not in self.get_column_indices():
                 return False, "System error. Please contact admin"
             
             # Update points
-            self.sheet.update_cell(row_num, points_col, new_points)
+            self.update_row_cells(challenger.row_num, {'Current_Points': new_points})
             
             logger.info(f"Points {action_text} for user {user_id}: {points} points")
             return True, f"Points {action_text}: {points}. New total: {new_points}"
-        except Exception as e:
+        except STORAGE_ERRORS as e:
             logger.error(f"Error adjusting points for user {user_id}: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
     def change_user_group(self, user_id, new_group):
         """Change a user's group (admin only)"""
         try:
-            if new_group.capitalize() not in ['Senior', 'Junior', 'Finalist']:
+            if new_group.capitalize() not in LEADERBOARD_GROUPS:
                 return False, "Invalid group. Must be Senior, Junior, or Finalist"
             
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return False, "User not found"
             
-            # Find group column
-            headers = self.sheet.row_values(1)
-            group_col = None
-            for i, header in enumerate(headers, start=1):
-                if header == 'Group':
-                    group_col = i
-                    break
-            if not group_col:
+            if 'Group' not in self.get_column_indices():
                 return False, "System error. Please contact admin"
             
             # Update group
-            self.sheet.update_cell(row_num, group_col, new_group.capitalize())
+            self.update_row_cells(challenger.row_num, {'Group': new_group.capitalize()})
             
             logger.info(f"User {user_id} group changed to {new_group}")
             return True, f"User group changed to {new_group.capitalize()}"
-        except Exception as e:
+        except STORAGE_ERRORS as e:
             logger.error(f"Error changing user group: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
     def delete_user(self, user_id):
         """Delete a user from the challenge (admin only)"""
         try:
-            row_num, challenger = self.find_challenger(user_id)
+            challenger = self.find_challenger(user_id)
             if not challenger:
                 return False, "User not found"
             
-            user_name = challenger.get('Name', 'Unknown')
-            
-            # Delete the row
-            self.sheet.delete_rows(row_num)
+            # Mark the row deleted, compaction removes it later so no row numbers shift now
+            self.update_row_cells(challenger.row_num, {'Status': Status.DELETED.value})
             
-            logger.info(f"User {user_id} ({user_name}) deleted from challenge")
-            return True, f"User {user_name} has been removed from the challenge"
-        except Exception as e:
+            logger.info(f"User {user_id} ({challenger.name}) deleted from challenge")
+            return True, f"User {challenger.name} has been removed from the challenge"
+        except STORAGE_ERRORS as e:
             logger.error(f"Error deleting user: {e}")
-            return False, "Unable to connect to database. Please try again in a moment"
+            return False, DB_ERROR_MSG
     
-    def get_admin_stats(self):
-        """Get admin statistics"""
+    def compact_deleted_rows(self):
+        """Remove every deleted user's row from the sheet in one request
+        
+        Covers all shards, so the caller must hold back writes on every shard
+        and reload their rosters afterwards. Returns the number of rows removed,
+        None on error.
+        """
         try:
-            records = self.sheet.get_all_records()
-            total_users = len(records)
-            active_users = len([r for r in records if r.get('Status') == 'Active'])
-            eliminated_users = len([r for r in records if r.get('Status') == 'Eliminated'])
-            senior_users = len([r for r in records if r.get('Group') == 'Senior'])
-            junior_users = len([r for r in records if r.get('Group') == 'Junior'])
-            finalist_users = len([r for r in records if r.get('Group') == 'Finalist'])
-            
-            current_date = self.get_current_date_string()
-            current_week = self.get_current_week_string()
-            
-            # Task completion stats for today/this week
-            daily1_today = len([r for r in records if r.get('Daily1_Last') == current_date])
-            daily2_today = len([r for r in records if r.get('Daily2_Last') == current_date])
-            daily3_today = len([r for r in records if r.get('Daily3_Last') == current_date])
-            weekly1_this_week = len([r for r in records if r.get('Weekly1_Week') == current_week])
-            weekly2_this_week = len([r for r in records if r.get('Weekly2_Week') == current_week])
-            
-            # Average points
-            total_points = sum(int(r.get('Current_Points', 0)) for r in records)
-            avg_points = round(total_points / total_users, 1) if total_users > 0 else 0
-            
-            stats_msg = f"""Admin Statistics:
-
-Users:
-Total: {total_users}
-Active: {active_users}
-Eliminated: {eliminated_users}
-Senior: {senior_users}
-Junior: {junior_users}
-Finalist: {finalist_users}
-
-Today's Completions:
-Daily 1: {daily1_today}
-Daily 2: {daily2_today}
-Daily 3: {daily3_today}
-
-This Week's Completions:
-Weekly 1: {weekly1_this_week}
-Weekly 2: {weekly2_this_week}
-
-Points:
-Total Points: {total_points}
-Average: {avg_points} pts/user"""
-            return stats_msg
+            statuses = self.sheet.col_values(self.get_column_indices()['Status'])
+            deleted = [row_num for row_num, value in enumerate(statuses, start=1)
+                       if row_num > 1 and str(value).strip().capitalize() == Status.DELETED.value]
+            if not deleted:
+                return 0
+            # Merge adjacent rows into ranges, bottom first so earlier deletes don't shift later ones
+            ranges = []
+            for row_num in reversed(deleted):
+                if ranges and ranges[-1][0] == row_num + 1:
+                    ranges[-1][0] = row_num
+                else:
+                    ranges.append([row_num, row_num + 1])
+            self.spreadsheet.batch_update({'requests': [{
+                'deleteDimension': {
+                    'range': {
+                        'sheetId': self.sheet.id,
+                        'dimension': 'ROWS',
+                        'startIndex': start - 1,
+                        'endIndex': end - 1
+                    }
+                }
+            } for start, end in ranges]})
+            logger.info(f"Compacted {len(deleted)} deleted rows")
+            return len(deleted)
+        except Exception as e:
+            logger.error(f"Error compacting deleted rows: {e}")
+            return None
+    
+    def reload_roster(self):
+        """Drop the cached roster after another shard moved rows"""
+        self.reads.invalidate()
+        return True
+    
+    def get_admin_counts(self):
+        """Count users, completions and points in this shard"""
+        try:
+            roster = self.get_roster()
+            counts = {
+                'total_users': len(roster),
+                'active_users': 0,
+                'eliminated_users': 0,
+                'senior_users': 0,
+                'junior_users': 0,
+                'finalist_users': 0,
+                'total_points': 0,
+                # Task completions for the current day/week/period
+                'tasks': {task_id: 0 for task_id in TASK_CATALOG}
+            }
+            stamps = current_stamps()
+            for challenger in roster:
+                if challenger.status is Status.ACTIVE:
+                    counts['active_users'] += 1
+                else:
+                    counts['eliminated_users'] += 1
+                counts[f"{challenger.group.value.lower()}_users"] += 1
+                counts['total_points'] += challenger.points
+                for task in TASK_CATALOG.values():
+                    if challenger.is_done(task, stamps):
+                        counts['tasks'][task.id] += 1
+            return counts
         except Exception as e:
             logger.error(f"Error getting admin stats: {e}")
-            return "Unable to connect to database. Please try again in a moment"
+            return None
+    
+    def get_admin_stats(self):
+        """Get admin statistics"""
+        counts = self.get_admin_counts()
+        if counts is None:
+            return DB_ERROR_MSG
+        return format_admin_stats(counts)
     
     def reset_challenge(self):
         """Reset all user progress (admin only)"""
         try:
             self.challenge_active = False
-            records = self.sheet.get_all_records()
-            # Reset all users
-            for i, record in enumerate(records, start=2):
-                # Reset points and tasks, keep strikes and status for eliminated users
-                if record.get('Status') == 'Eliminated':
+            columns = self.get_column_indices()
+            reset_values = {'Current_Points': 0, TASK_STATE_COLUMN: '', TASK_LAST_COLUMN: ''}
+            for task in TASK_CATALOG.values():
+                if task.legacy_column:
+                    reset_values[task.legacy_column] = ''
+            # Reset points and tasks, keep strikes and status for eliminated users
+            cells = []
+            for challenger in self.get_roster():
+                if challenger.status is Status.ELIMINATED:
                     continue
-                # Find column indices
-                headers = self.sheet.row_values(1)
-                updates = []
-                for j, header in enumerate(headers, start=1):
-                    if header == 'Current_Points':
-                        updates.append((i, j, 0))
-                    elif header in ['Daily1_Last', 'Daily2_Last', 'Daily3_Last', 'Weekly1_Week', 'Weekly2_Week']:
-                        updates.append((i, j, ''))
-                # Batch update (simple looped updates)
-                for row, col, value in updates:
-                    self.sheet.update_cell(row, col, value)
+                for header, value in reset_values.items():
+                    if header in columns:
+                        cells.append(gspread.Cell(challenger.row_num, columns[header], value))
+            # One batched write for the whole shard
+            if cells:
+                self.sheet.update_cells(cells, value_input_option='USER_ENTERED')
             
             self.challenge_active = True
             logger.info("Challenge reset completed")
@@ -591,28 +1195,1125 @@ Average: {avg_points} pts/user"""
             self.challenge_active = True
             return False, "Unable to reset challenge. Please try again"
 
-# Global bot instance
-bot_instance = None
+def format_task_lines(kind, render):
+    """One section per period ("Today's Tasks:" ...), render(task) gives each line"""
+    sections = {}
+    for task in TASK_CATALOG.values():
+        if task.period_key not in sections:
+            if task.period == 'daily':
+                heading = f"Today's {kind}:"
+            elif task.period == 'weekly':
+                heading = f"This Week's {kind}:"
+            else:
+                heading = f"This {task.days}-Day Period's {kind}:"
+            sections[task.period_key] = [heading]
+        sections[task.period_key].append(render(task))
+    return "\n\n".join("\n".join(lines) for lines in sections.values())
+
+def merge_rankings(parts):
+    """Merge per-shard rankings into one ranked list per group"""
+    groups = {group: [] for group in LEADERBOARD_GROUPS}
+    for part in parts:
+        for group, users in part.items():
+            groups[group].extend(users)
+    for users in groups.values():
+        users.sort(key=lambda x: x['points'], reverse=True)
+    return groups
+
+def format_leaderboard(groups):
+    """Build the leaderboard message from per-group entries"""
+    msg = "SGI Challenge Leaderboard:\n\n"
+    sections = []
+    for group in LEADERBOARD_GROUPS:
+        users = groups.get(group)
+        if not users:
+            continue
+        section = f"{group} Group:\n"
+        for i, user in enumerate(users[:LEADERBOARD_SIZE], 1):
+            section += f"{i}. {user['name']}: {user['points']} pts\n"
+        sections.append(section)
+    if not sections:
+        return "No active challengers found"
+    return msg + "\n".join(sections)
+
+def merge_admin_counts(parts):
+    """Sum per-shard admin counters"""
+    counts = {'tasks': {}}
+    for part in parts:
+        for key, value in part.items():
+            if key == 'tasks':
+                for task_id, done in value.items():
+                    counts['tasks'][task_id] = counts['tasks'].get(task_id, 0) + done
+            else:
+                counts[key] = counts.get(key, 0) + value
+    return counts
+
+def format_admin_stats(counts):
+    """Build the admin statistics message from counters"""
+    total_users = counts['total_users']
+    total_points = counts['total_points']
+    avg_points = round(total_points / total_users, 1) if total_users > 0 else 0
+    return f"""Admin Statistics:
+
+Users:
+Total: {total_users}
+Active: {counts['active_users']}
+Eliminated: {counts['eliminated_users']}
+Senior: {counts['senior_users']}
+Junior: {counts['junior_users']}
+Finalist: {counts['finalist_users']}
+
+{format_task_lines("Completions", lambda task: f"{task.label}: {counts['tasks'].get(task.id, 0)}")}
+
+Points:
+Total Points: {total_points}
+Average: {avg_points} pts/user"""
+
+class LocalExecutor:
+    """Runs SGIBot calls in this process, off the event loop"""
+    
+    num_shards = 1
+    
+    def __init__(self, bot):
+        self.bot = bot
+    
+    def is_admin(self, user_id):
+        return self.bot.is_admin(user_id)
+    
+    def shard_of(self, user_id):
+        return 0
+    
+    def start(self):
+        pass
+    
+    def stop(self):
+        pass
+    
+    async def call(self, user_id, method, *args):
+        """Run a call for one user in a worker thread"""
+        return await asyncio.to_thread(self.bot.run, method, *args)
+    
+    async def call_shard(self, shard_id, method, *args):
+        """Run a call on one shard"""
+        return await asyncio.to_thread(self.bot.run, method, *args)
+    
+    async def gather(self, method, *args):
+        """Run a call over every shard (there is only one here)"""
+        return [await asyncio.to_thread(self.bot.run, method, *args)]
+
+def shard_worker(shard_id, num_shards, spreadsheet_id, admin_user_ids, task_queue, result_queue):
+    """Worker process: run SGIBot calls for one shard in arrival order"""
+    try:
+        bot = SGIBot(spreadsheet_id, admin_user_ids, shard_id=shard_id, num_shards=num_shards)
+    except Exception as e:
+        logger.error(f"Shard {shard_id} failed to start: {e}")
+        return
+    logger.info(f"Shard worker {shard_id}/{num_shards} ready")
+    while True:
+        task = task_queue.get()
+        if task is None:
+            break
+        request_id, method, args, snapshot = task
+        try:
+            if snapshot is None:
+                result = bot.run(method, *args)
+            else:
+                result = bot.run_on_rows(*snapshot, method, *args)
+            result_queue.put((request_id, True, result))
+        except Exception as e:
+            logger.exception(f"Shard {shard_id} failed running {method}")
+            result_queue.put((request_id, False, str(e)))
+
+class ShardTimeout(RuntimeError):
+    """A worker did not answer in time, the call may still be running there"""
+
+class ShardedExecutor:
+    """Dispatches SGIBot calls to worker processes sharded by user ID
+    
+    The receiver process only handles Telegram traffic. Every user hashes to
+    one worker, and each worker runs its queue one call at a time, so
+    commands from the same user keep their order. Whole-roster reads are
+    sent to every worker and the partial results merged by the caller.
+    
+    For reads the receiver downloads the sheet once (coalesced like
+    SGIBot's reads) and sends each worker only the rows it owns, so N
+    workers still cost one download. Each download gets a version, and a
+    worker that already parsed a version only receives the version number.
+    Writes load their rows in the worker.
+    """
+    
+    def __init__(self, num_workers, spreadsheet_id, admin_user_ids, call_timeout=60):
+        self.num_workers = num_workers
+        self.spreadsheet_id = spreadsheet_id
+        self.raw_admin_user_ids = admin_user_ids
+        self.admin_user_ids = set(map(int, admin_user_ids.split(',')))
+        self.call_timeout = call_timeout
+        self.context = multiprocessing.get_context('spawn')
+        self.task_queues = []
+        self.processes = []
+        self.result_queue = None
+        self.listener = None
+        self.loop = None
+        self.pending = {}
+        self.request_ids = itertools.count()
+        self.sheet = None
+        self.reads = SingleFlight(READ_CACHE_SECONDS)
+        self.versions = itertools.count(1)
+        self.sent_versions = [None] * num_workers
+    
+    def is_admin(self, user_id):
+        return user_id in self.admin_user_ids
+    
+    def shard_of(self, user_id):
+        return shard_for_user(user_id, self.num_workers)
+    
+    def start(self):
+        """Spawn the shard workers and the result listener"""
+        self.sheet = gc.open_by_key(self.spreadsheet_id).sheet1
+        self.result_queue = self.context.Queue()
+        for shard_id in range(self.num_workers):
+            task_queue = self.context.Queue()
+            process = self.context.Process(
+                target=shard_worker,
+                args=(shard_id, self.num_workers, self.spreadsheet_id,
+                      self.raw_admin_user_ids, task_queue, self.result_queue),
+                daemon=True
+            )
+            process.start()
+            self.task_queues.append(task_queue)
+            self.processes.append(process)
+        self.listener = threading.Thread(target=self.listen_for_results, daemon=True)
+        self.listener.start()
+        logger.info(f"Started {self.num_workers} shard workers")
+    
+    def stop(self):
+        """Let the workers finish their queues and exit"""
+        for task_queue in self.task_queues:
+            task_queue.put(None)
+        for process in self.processes:
+            process.join(timeout=10)
+        if self.result_queue is not None:
+            self.result_queue.put(None)
+            self.listener.join(timeout=10)
+    
+    def listen_for_results(self):
+        """Hand worker results back to the event loop"""
+        while True:
+            item = self.result_queue.get()
+            if item is None:
+                break
+            self.loop.call_soon_threadsafe(self.resolve, *item)
+    
+    def resolve(self, request_id, ok, payload):
+        future = self.pending.pop(request_id, None)
+        if future is None or future.done():
+            return
+        if ok:
+            future.set_result(payload)
+        else:
+            future.set_exception(RuntimeError(payload))
+    
+    def submit(self, shard_id, method, args, rows=None):
+        # Enqueue synchronously so tasks reach a shard in the order handlers ran
+        if self.loop is None:
+            self.loop = asyncio.get_running_loop()
+        request_id = next(self.request_ids)
+        future = self.loop.create_future()
+        self.pending[request_id] = future
+        self.task_queues[shard_id].put((request_id, method, args, rows))
+        return future
+    
+    async def wait(self, future):
+        try:
+            return await asyncio.wait_for(future, self.call_timeout)
+        except asyncio.TimeoutError:
+            raise ShardTimeout("Shard worker did not answer in time")
+    
+    def fetch_rows(self):
+        """Download the sheet once and split its rows by owning shard, returns (version, rows)"""
+        rows = [[] for _ in range(self.num_workers)]
+        for row_num, record in enumerate(self.sheet.get_all_records(), start=2):
+            rows[self.shard_of(record.get('User_ID'))].append((row_num, record))
+        return next(self.versions), rows
+    
+    async def shard_rows(self):
+        """Rows of every shard for a read, None to let the workers read themselves"""
+        try:
+            return await asyncio.to_thread(self.reads.do, 'rows', self.fetch_rows)
+        except Exception as e:
+            logger.warning(f"Receiver could not read the sheet, workers will retry: {e}")
+            return None
+    
+    def snapshot_for(self, shard_id, fetched):
+        """What to send a shard along with a read: (version, rows or None if it has them)"""
+        if fetched is None:
+            return None
+        version, rows = fetched
+        # Tasks reach a worker in order, so it has parsed every version sent before
+        if self.sent_versions[shard_id] == version:
+            return version, None
+        self.sent_versions[shard_id] = version
+        return version, rows[shard_id]
+    
+    async def run_on(self, shard_ids, method, args):
+        """Run a call on the given shards, returns their results in order"""
+        if method in SGIBot.READ_METHODS:
+            fetched = await self.shard_rows()
+            futures = [
+                self.submit(shard_id, method, args, self.snapshot_for(shard_id, fetched))
+                for shard_id in shard_ids
+            ]
+            return await asyncio.gather(*(self.wait(future) for future in futures))
+        futures = [self.submit(shard_id, method, args) for shard_id in shard_ids]
+        if method in SGIBot.EXPORT_METHODS:
+            return await asyncio.gather(*(self.wait(future) for future in futures))
+        try:
+            return await asyncio.gather(*(self.wait(future) for future in futures))
+        finally:
+            self.reads.invalidate()
+    
+    async def call(self, user_id, method, *args):
+        """Run a call on the shard that owns user_id"""
+        return (await self.run_on([self.shard_of(user_id)], method, args))[0]
+    
+    @property
+    def num_shards(self):
+        return self.num_workers
+    
+    async def call_shard(self, shard_id, method, *args):
+        """Run a call on one shard"""
+        return (await self.run_on([shard_id], method, args))[0]
+    
+    async def gather(self, method, *args):
+        """Run a call on every shard and return all results"""
+        return await self.run_on(range(self.num_workers), method, args)
+
+class IngestQueue:
+    """Durable queue of write commands stored in SQLite (WAL mode)
+    
+    Commands are keyed by Telegram update_id, so a redelivered update is
+    never queued twice. Rows go pending -> done (result stored) -> replied,
+    which lets a restart finish both unprocessed commands and unsent replies.
+    Dead-lettered commands go pending -> failed -> dead instead.
+    """
+    
+    def __init__(self, path, max_depth):
+        self.max_depth = max_depth
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("PRAGMA synchronous=NORMAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS ingest_queue (
+                update_id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                chat_id INTEGER NOT NULL,
+                message_id INTEGER,
+                method TEXT NOT NULL,
+                args TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'pending',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                result TEXT,
+                created_at REAL NOT NULL,
+                processed_at REAL
+            )""")
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS ingest_queue_status ON ingest_queue (status, update_id)"
+        )
+    
+    def depth(self):
+        """Number of commands still waiting for storage"""
+        return self.conn.execute(
+            "SELECT COUNT(*) FROM ingest_queue WHERE status = 'pending'"
+        ).fetchone()[0]
+    
+    def enqueue(self, update_id, user_id, chat_id, message_id, method, args):
+        """Persist a command, returns False if this update was already queued"""
+        cursor = self.conn.execute(
+            """INSERT OR IGNORE INTO ingest_queue
+               (update_id, user_id, chat_id, message_id, method, args, created_at)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (update_id, user_id, chat_id, message_id, method, json.dumps(args), time.time())
+        )
+        return cursor.rowcount == 1
+    
+    def pending(self, limit):
+        """Oldest pending commands first"""
+        rows = self.conn.execute(
+            """SELECT update_id, user_id, method, args, attempts FROM ingest_queue
+               WHERE status = 'pending' ORDER BY update_id LIMIT ?""",
+            (limit,)
+        ).fetchall()
+        return [
+            (update_id, user_id, method, json.loads(args), attempts)
+            for update_id, user_id, method, args, attempts in rows
+        ]
+    
+    def unreplied(self, limit):
+        """Processed or dead-lettered commands whose reply has not been sent yet"""
+        return self.conn.execute(
+            """SELECT update_id, chat_id, message_id, result FROM ingest_queue
+               WHERE status IN ('done', 'failed') ORDER BY update_id LIMIT ?""",
+            (limit,)
+        ).fetchall()
+    
+    def mark_done(self, update_id, result):
+        self.conn.execute(
+            "UPDATE ingest_queue SET status = 'done', result = ?, processed_at = ? WHERE update_id = ?",
+            (result, time.time(), update_id)
+        )
+    
+    def mark_replied(self, update_id):
+        self.conn.execute(
+            """UPDATE ingest_queue SET status = CASE status WHEN 'failed' THEN 'dead' ELSE 'replied' END
+               WHERE update_id = ?""",
+            (update_id,)
+        )
+    
+    def mark_dead(self, update_id, result):
+        """Give up on a command, the user still gets result as the reply"""
+        self.conn.execute(
+            "UPDATE ingest_queue SET status = 'failed', result = ?, processed_at = ? WHERE update_id = ?",
+            (result, time.time(), update_id)
+        )
+    
+    def mark_failed_attempt(self, update_id):
+        self.conn.execute("UPDATE ingest_queue SET attempts = attempts + 1 WHERE update_id = ?", (update_id,))
+    
+    def iter_events(self, chunk_size, status=None, since=None, until=None):
+        """Yield chunks of command history rows, oldest first"""
+        query = """SELECT update_id, user_id, method, args, status, attempts, result, created_at, processed_at
+                   FROM ingest_queue WHERE 1 = 1"""
+        params = []
+        if status:
+            query += " AND status = ?"
+            params.append(status)
+        if since is not None:
+            query += " AND created_at >= ?"
+            params.append(since)
+        if until is not None:
+            query += " AND created_at < ?"
+            params.append(until)
+        cursor = self.conn.execute(query + " ORDER BY update_id", params)
+        while True:
+            rows = cursor.fetchmany(chunk_size)
+            if not rows:
+                return
+            yield [{
+                'update_id': update_id,
+                'user_id': user_id,
+                'command': method,
+                'args': args,
+                'status': row_status,
+                'attempts': attempts,
+                'result': result,
+                'created_at': datetime.fromtimestamp(created_at).isoformat(timespec='seconds'),
+                'processed_at': datetime.fromtimestamp(processed_at).isoformat(timespec='seconds') if processed_at else ''
+            } for update_id, user_id, method, args, row_status, attempts, result, created_at, processed_at in rows]
+
+class IngestProcessor:
+    """Drains the ingest queue at the pace storage allows
+    
+    Commands are grouped by shard: shards run side by side while each
+    shard's commands run in update order. A storage failure stops that
+    shard's run and backs off; the command stays pending and is retried,
+    up to max_attempts times. A command that raises, or that failed on
+    storage max_attempts times, is dead-lettered and the user told so.
+    """
+    
+    def __init__(self, queue, bot, on_change=None, on_refused=None, batch_size=20, retry_delay=2,
+                 max_retry_delay=60, max_attempts=INGEST_MAX_ATTEMPTS):
+        self.queue = queue
+        self.bot = bot
+        self.max_attempts = max_attempts
+        # Called with the user ID after a command succeeded, i.e. standings may have changed
+        self.on_change = on_change
+        # Called with (user_id, method, args, reply) after a command was refused, e.g. already done
+        self.on_refused = on_refused
+        self.batch_size = batch_size
+        self.retry_delay = retry_delay
+        self.max_retry_delay = max_retry_delay
+        self.current_delay = retry_delay
+        self.healthy = True
+        self.wakeup = asyncio.Event()
+        # Held while a batch runs; bulk jobs take it to run with no queued command in flight
+        self.lock = asyncio.Lock()
+    
+    def wake(self):
+        self.wakeup.set()
+    
+    async def run(self):
+        """Process the queue until cancelled"""
+        await self.send_replies()
+        while True:
+            self.wakeup.clear()
+            rows = self.queue.pending(self.batch_size)
+            if not rows:
+                try:
+                    await asyncio.wait_for(self.wakeup.wait(), timeout=30)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+            by_shard = {}
+            for row in rows:
+                by_shard.setdefault(executor.shard_of(row[1]), []).append(row)
+            async with self.lock:
+                results = await asyncio.gather(*(self.process_shard(shard_rows) for shard_rows in by_shard.values()))
+            await self.send_replies()
+            if all(results):
+                self.healthy = True
+                self.current_delay = self.retry_delay
+            else:
+                self.healthy = False
+                logger.warning(f"Storage unavailable, retrying queued commands in {self.current_delay}s")
+                await asyncio.sleep(self.current_delay)
+                self.current_delay = min(self.current_delay * 2, self.max_retry_delay)
+    
+    async def process_shard(self, rows):
+        """Run one shard's commands in order, False if storage failed"""
+        for update_id, user_id, method, args, attempts in rows:
+            try:
+                success, message = await executor.call(user_id, 'run_command', update_id, method, *args)
+            except ShardTimeout:
+                # The worker may still apply it, so it is not run again
+                logger.error(f"Queued update {update_id} ({method}) timed out, not retrying")
+                self.queue.mark_done(update_id, COMMAND_TIMEOUT_MSG)
+                continue
+            except Exception:
+                logger.exception(f"Queued update {update_id} ({method}) failed, dead-lettering it")
+                self.queue.mark_dead(update_id, COMMAND_FAILED_MSG)
+                continue
+            if message in STORAGE_ERROR_MESSAGES:
+                if attempts + 1 >= self.max_attempts:
+                    logger.error(f"Queued update {update_id} ({method}) failed {attempts + 1} times, dead-lettering it")
+                    self.queue.mark_dead(update_id, COMMAND_FAILED_MSG)
+                else:
+                    self.queue.mark_failed_attempt(update_id)
+                return False
+            self.queue.mark_done(update_id, message)
+            if success and self.on_change:
+                self.on_change(user_id)
+            elif not success and self.on_refused:
+                self.on_refused(user_id, method, args, message)
+        return True
+    
+    async def send_replies(self):
+        """Send results for processed commands"""
+        while True:
+            rows = self.queue.unreplied(self.batch_size)
+            if not rows:
+                return
+            for update_id, chat_id, message_id, result in rows:
+                try:
+                    await self.bot.send_message(
+                        chat_id, result,
+                        reply_to_message_id=message_id,
+                        allow_sending_without_reply=True
+                    )
+                except Exception as e:
+                    logger.error(f"Could not send reply for update {update_id}: {e}")
+                self.queue.mark_replied(update_id)
+
+class LeaderboardPins:
+    """Pinned leaderboard message of each chat, kept in the bot's SQLite file"""
+    
+    def __init__(self, path):
+        self.conn = sqlite3.connect(path, isolation_level=None)
+        self.conn.execute("PRAGMA journal_mode=WAL")
+        self.conn.execute("""
+            CREATE TABLE IF NOT EXISTS pinned_leaderboards (
+                chat_id INTEGER PRIMARY KEY,
+                message_id INTEGER NOT NULL
+            )""")
+    
+    def all(self):
+        return dict(self.conn.execute("SELECT chat_id, message_id FROM pinned_leaderboards").fetchall())
+    
+    def get(self, chat_id):
+        row = self.conn.execute(
+            "SELECT message_id FROM pinned_leaderboards WHERE chat_id = ?", (chat_id,)
+        ).fetchone()
+        return row[0] if row else None
+    
+    def set(self, chat_id, message_id):
+        self.conn.execute(
+            "INSERT OR REPLACE INTO pinned_leaderboards (chat_id, message_id) VALUES (?, ?)",
+            (chat_id, message_id)
+        )
+    
+    def remove(self, chat_id):
+        self.conn.execute("DELETE FROM pinned_leaderboards WHERE chat_id = ?", (chat_id,))
+
+class LeaderboardUpdater:
+    """Edits pinned leaderboard messages in place when standings change
+    
+    mark_dirty() may be called on every change. Changes are coalesced into
+    at most one refresh per interval, and a chat's message is only edited
+    when its rendered text differs from what it already shows.
+    """
+    
+    def __init__(self, pins, bot, interval):
+        self.pins = pins
+        self.bot = bot
+        self.interval = interval
+        self.dirty = asyncio.Event()
+        self.last_text = {}
+        self.last_refresh = 0
+        # chat_id -> when /leaderboard was last pointed at the pinned message
+        self.last_pointer = {}
+    
+    def mark_dirty(self):
+        self.dirty.set()
+    
+    def take_pointer(self, chat_id):
+        """Check if a chat may be pointed at its pinned message, at most once per interval"""
+        now = time.monotonic()
+        if chat_id in self.last_pointer and now - self.last_pointer[chat_id] < self.interval:
+            return False
+        self.last_pointer[chat_id] = now
+        return True
+    
+    async def run(self):
+        """Refresh pinned messages until cancelled"""
+        while True:
+            await self.dirty.wait()
+            # Let a burst of changes settle into one edit
+            delay = self.last_refresh + self.interval - time.monotonic()
+            if delay > 0:
+                await asyncio.sleep(delay)
+            self.dirty.clear()
+            self.last_refresh = time.monotonic()
+            try:
+                await self.refresh()
+            except Exception as e:
+                logger.error(f"Error refreshing pinned leaderboards: {e}")
+    
+    async def refresh(self):
+        pins = self.pins.all()
+        if not pins:
+            return
+        text = await fetch_leaderboard()
+        if text == DB_ERROR_MSG:
+            # Try again next interval
+            self.dirty.set()
+            return
+        for chat_id, message_id in pins.items():
+            if self.last_text.get(chat_id) == text:
+                continue
+            try:
+                await self.bot.edit_message_text(text, chat_id=chat_id, message_id=message_id)
+            except BadRequest as e:
+                if 'not modified' in str(e).lower():
+                    pass
+                elif 'not found' in str(e).lower():
+                    logger.info(f"Pinned leaderboard in chat {chat_id} is gone, forgetting it")
+                    self.pins.remove(chat_id)
+                    continue
+                else:
+                    logger.warning(f"Could not edit pinned leaderboard in chat {chat_id}: {e}")
+                    continue
+            self.last_text[chat_id] = text
+
+class Standings:
+    """Merged per-group rankings, rebuilt only when standings change
+    
+    version is bumped after every write. Rankings, the user_id -> rank
+    index, the name prefix index and rendered pages all belong to one
+    version, so paging, rank lookups and inline searches never touch the
+    sheet until something changes (or the data is older than max_age, to
+    pick up manual sheet edits).
+    """
+    
+    def __init__(self, page_size, max_age):
+        self.page_size = page_size
+        self.max_age = max_age
+        self.version = 0
+        self.built_version = None
+        self.built_at = 0
+        self.rankings = {group: [] for group in LEADERBOARD_GROUPS}
+        self.positions = {}
+        # Sorted (name or name word in lowercase, user_id) pairs for prefix search
+        self.name_index = []
+        self.pages = {}
+        self.lock = asyncio.Lock()
+    
+    def bump(self):
+        self.version += 1
+    
+    async def load(self):
+        """Make sure rankings are current, False if storage is unavailable"""
+        async with self.lock:
+            if self.built_version == self.version and time.monotonic() - self.built_at < self.max_age:
+                return True
+            version = self.version
+            parts = await executor.gather('get_rankings')
+            if any(part is None for part in parts):
+                return False
+            self.rankings = merge_rankings(parts)
+            self.positions = {
+                user['user_id']: (group, index)
+                for group, users in self.rankings.items()
+                for index, user in enumerate(users)
+            }
+            self.name_index = sorted({
+                (token, user['user_id'])
+                for users in self.rankings.values()
+                for user in users
+                for token in [user['name'].lower()] + user['name'].lower().split()
+            })
+            self.pages = {}
+            self.built_version = version
+            self.built_at = time.monotonic()
+            return True
+    
+    def page_count(self, group):
+        return max(1, -(-len(self.rankings[group]) // self.page_size))
+    
+    async def find(self, user_id):
+        """(group, index) of a ranked user, None if not ranked or unavailable"""
+        if not await self.load():
+            return None
+        return self.positions.get(user_id)
+    
+    async def search(self, prefix, limit):
+        """Ranked users whose name or a word of it starts with prefix
+        
+        Returns (group, index, user) tuples, the top of each group for an
+        empty prefix, or None if storage is unavailable.
+        """
+        if not await self.load():
+            return None
+        if not prefix:
+            per_group = max(1, limit // len(LEADERBOARD_GROUPS))
+            return [(group, index, user)
+                    for group, users in self.rankings.items()
+                    for index, user in enumerate(users[:per_group])]
+        matches = []
+        seen = set()
+        start = bisect.bisect_left(self.name_index, (prefix,))
+        for token, user_id in itertools.islice(self.name_index, start, None):
+            if not token.startswith(prefix) or len(matches) >= limit:
+                break
+            if user_id in seen:
+                continue
+            seen.add(user_id)
+            group, index = self.positions[user_id]
+            matches.append((group, index, self.rankings[group][index]))
+        return matches
+    
+    async def render_page(self, group, page):
+        """Text and keyboard for one page of a group, None if storage is unavailable"""
+        if not await self.load():
+            return None
+        page = min(max(page, 0), self.page_count(group) - 1)
+        key = (group, page)
+        if key not in self.pages:
+            self.pages[key] = self.build_page(group, page)
+        return self.pages[key]
+    
+    def build_page(self, group, page):
+        users = self.rankings[group]
+        pages = self.page_count(group)
+        start = page * self.page_size
+        text = f"{group} Group Leaderboard (page {page + 1}/{pages}):\n\n"
+        if users:
+            for i, user in enumerate(users[start:start + self.page_size], start + 1):
+                text += f"{i}. {user['name']}: {user['points']} pts\n"
+        else:
+            text += "No active challengers found"
+        nav = []
+        if page > 0:
+            nav.append(InlineKeyboardButton("◀ Prev", callback_data=f"lb:{group}:{page - 1}"))
+        if page < pages - 1:
+            nav.append(InlineKeyboardButton("Next ▶", callback_data=f"lb:{group}:{page + 1}"))
+        keyboard = [nav] if nav else []
+        keyboard.append([InlineKeyboardButton("My rank", callback_data=f"lb:{group}:me")])
+        return text.rstrip(), InlineKeyboardMarkup(keyboard)
+
+def parse_throttle_limits(spec):
+    """Parse 'mystatus=3/60,done=5/60' into {command: (burst, seconds)}"""
+    limits = {}
+    for part in spec.split(','):
+        part = part.strip()
+        if not part:
+            continue
+        command, _, rate = part.partition('=')
+        burst, _, seconds = rate.partition('/')
+        try:
+            burst, seconds = int(burst), float(seconds)
+        except ValueError:
+            burst, seconds = 0, 0
+        if burst < 1 or seconds <= 0:
+            raise ValueError(f"bad THROTTLE_LIMITS entry {part!r}")
+        limits[command.strip().lower()] = (burst, seconds)
+    return limits
+
+class CommandThrottle:
+    """Per-user token buckets for commands, and each user's recent replies
+    
+    A command's bucket holds up to burst tokens and refills burst tokens
+    every seconds. Commands without a limit are never throttled.
+    """
+    
+    def __init__(self, limits, cache_seconds):
+        self.limits = limits
+        self.cache_seconds = cache_seconds
+        # (user_id, command) -> [tokens, updated at, rejected since last allowed]
+        self.buckets = {}
+        # user_id -> {command text: (stored at, reply)}
+        self.replies = {}
+        self.hits = {}
+        self.cache_hits = 0
+        self.last_prune = time.monotonic()
+    
+    def allow(self, user_id, command):
+        """Take a token, returns the seconds to wait instead when none is left"""
+        limit = self.limits.get(command)
+        if not limit:
+            return 0
+        burst, seconds = limit
+        now = time.monotonic()
+        self.prune(now)
+        bucket = self.buckets.setdefault((user_id, command), [burst, now, 0])
+        bucket[0] = min(burst, bucket[0] + (now - bucket[1]) * burst / seconds)
+        bucket[1] = now
+        if bucket[0] >= 1:
+            bucket[0] -= 1
+            bucket[2] = 0
+            return 0
+        self.hits[command] = self.hits.get(command, 0) + 1
+        bucket[2] += 1
+        if bucket[2] == 1:
+            logger.info(f"Throttling /{command} for user {user_id}")
+        return max(1, math.ceil((1 - bucket[0]) * seconds / burst))
+    
+    def cached_reply(self, user_id, key):
+        entry = self.replies.get(user_id, {}).get(key)
+        if entry and time.monotonic() - entry[0] < self.cache_seconds:
+            self.cache_hits += 1
+            return entry[1]
+        return None
+    
+    def remember(self, user_id, key, reply):
+        self.replies.setdefault(user_id, {})[key] = (time.monotonic(), reply)
+    
+    def forget(self, user_id=None):
+        """Drop a user's cached replies after a write, everyone's when user_id is None"""
+        if user_id is None:
+            self.replies.clear()
+        else:
+            self.replies.pop(user_id, None)
+    
+    def prune(self, now):
+        """Drop refilled buckets and expired replies, at most once a minute"""
+        if now - self.last_prune < 60:
+            return
+        self.last_prune = now
+        for key, (tokens, updated, rejected) in list(self.buckets.items()):
+            burst, seconds = self.limits[key[1]]
+            if tokens + (now - updated) * burst / seconds >= burst:
+                del self.buckets[key]
+        for user_id, entries in list(self.replies.items()):
+            if all(now - stored >= self.cache_seconds for stored, reply in entries.values()):
+                del self.replies[user_id]
+
+def format_throttle_stats(throttle):
+    hits = ', '.join(f"/{command}: {count}" for command, count in sorted(throttle.hits.items())) or 'none'
+    return f"""Throttling:
+Rejected: {hits}
+Answered from cache: {throttle.cache_hits}"""
+
+class ExportWriter:
+    """Streams rows into a gzip-compressed CSV or JSON document
+    
+    The document stays in memory up to EXPORT_SPOOL_BYTES of compressed
+    data and spills into a temp file after that.
+    """
+    
+    def __init__(self, fmt, fields):
+        self.fmt = fmt
+        self.count = 0
+        self.file = tempfile.SpooledTemporaryFile(max_size=EXPORT_SPOOL_BYTES)
+        self.gzip = gzip.GzipFile(fileobj=self.file, mode='wb')
+        self.text = io.TextIOWrapper(self.gzip, encoding='utf-8', newline='')
+        if fmt == 'csv':
+            self.csv = csv.DictWriter(self.text, fieldnames=fields)
+            self.csv.writeheader()
+        else:
+            self.text.write('[')
+    
+    def write_rows(self, rows):
+        for row in rows:
+            if self.fmt == 'csv':
+                self.csv.writerow(row)
+            else:
+                self.text.write((',\n' if self.count else '\n') + json.dumps(row, ensure_ascii=False))
+            self.count += 1
+    
+    def finish(self):
+        """Close the compressed stream, returns the document rewound to the start"""
+        if self.fmt == 'json':
+            self.text.write('\n]\n')
+        self.text.flush()
+        self.text.detach()
+        self.gzip.close()
+        self.file.seek(0)
+        return self.file
+    
+    def close(self):
+        """Release the document, also when the export failed before finish()"""
+        if not self.gzip.closed:
+            # Closing the text layer closes the gzip stream under it
+            self.text.close()
+        self.file.close()
+
+def parse_export_args(args):
+    """Split /admin_export arguments into kind, format and filters"""
+    positional = [arg.lower() for arg in args if '=' not in arg]
+    kind = positional[0] if positional else 'roster'
+    fmt = positional[1] if len(positional) > 1 else 'csv'
+    if kind not in ('roster', 'events') or fmt not in ('csv', 'json') or len(positional) > 2:
+        raise ValueError("Unknown export type or format")
+    filters = {}
+    for arg in args:
+        if '=' not in arg:
+            continue
+        key, _, value = arg.partition('=')
+        key = key.lower()
+        if key == 'group' and kind == 'roster' and value.capitalize() in LEADERBOARD_GROUPS:
+            filters['group'] = value.capitalize()
+        elif key == 'status' and kind == 'roster' and value.capitalize() in [member.value for member in Status if member is not Status.DELETED]:
+            filters['status'] = value.capitalize()
+        elif key == 'status' and kind == 'events' and value.lower() in ('pending', 'done', 'replied', 'failed', 'dead'):
+            filters['status'] = value.lower()
+        elif key in ('from', 'to') and kind == 'events':
+            day = datetime.strptime(value, "%Y-%m-%d")
+            # to= is inclusive, so filter on the start of the next day
+            filters[key] = day.timestamp() if key == 'from' else day.timestamp() + 86400
+        else:
+            raise ValueError(f"Unsupported filter {arg}")
+    return kind, fmt, filters
+
+def parse_import_csv(text):
+    """Validate user_id,name,group lines, returns (rows, duplicates, invalid)
+    
+    invalid is a list of (line number, reason). A user ID repeated in
+    the file keeps its first line, later ones count as duplicates.
+    """
+    rows = []
+    seen = set()
+    duplicates = 0
+    invalid = []
+    for line_num, fields in enumerate(csv.reader(io.StringIO(text)), start=1):
+        if not any(field.strip() for field in fields):
+            continue
+        if line_num == 1 and [field.strip().lower() for field in fields] == ['user_id', 'name', 'group']:
+            continue
+        if len(fields) != 3:
+            invalid.append((line_num, "expected user_id,name,group"))
+            continue
+        user_id, name, group = (field.strip() for field in fields)
+        try:
+            user_id = int(user_id)
+        except ValueError:
+            invalid.append((line_num, f"bad user_id {user_id!r}"))
+            continue
+        if not name:
+            invalid.append((line_num, "empty name"))
+            continue
+        group = group.capitalize()
+        if group not in LEADERBOARD_GROUPS:
+            invalid.append((line_num, f"unknown group {group!r}"))
+            continue
+        if user_id in seen:
+            duplicates += 1
+            continue
+        seen.add(user_id)
+        rows.append({'user_id': user_id, 'name': name, 'group': group})
+    return rows, duplicates, invalid
+
+async def import_challengers(rows):
+    """Send each shard its rows in one call, returns (inserted, skipped, failed)
+    
+    Shards succeed or fail on their own: failed counts the rows of shards
+    that could not write, the other shards' rows are still imported.
+    """
+    by_shard = {}
+    for row in rows:
+        by_shard.setdefault(executor.shard_of(row['user_id']), []).append(row)
+    async with ingest_processor.lock:
+        results = await asyncio.gather(*(
+            executor.call_shard(shard_id, 'import_challengers', shard_rows)
+            for shard_id, shard_rows in by_shard.items()
+        ), return_exceptions=True)
+    inserted, skipped, failed = 0, 0, 0
+    for (shard_id, shard_rows), result in zip(by_shard.items(), results):
+        if isinstance(result, Exception) or result is None:
+            logger.error(f"Import of {len(shard_rows)} rows failed on shard {shard_id}: {result}")
+            failed += len(shard_rows)
+        else:
+            inserted += result[0]
+            skipped += result[1]
+    return inserted, skipped, failed
+
+async def compact_roster():
+    """Remove deleted users' rows, then reload every shard's roster
+    
+    Deleting rows shifts the rows below them, so no write may run on any
+    shard until all shards have dropped their cached row numbers.
+    """
+    removed = None
+    async with ingest_processor.lock:
+        try:
+            removed = await executor.call_shard(0, 'compact_deleted_rows')
+        finally:
+            # A failed or timed out call may still have deleted rows
+            if removed != 0:
+                await executor.gather('reload_roster')
+    return removed
+
+async def run_compaction(hour):
+    """Compact the roster once a day at the given local hour"""
+    while True:
+        now = datetime.now()
+        next_run = now.replace(hour=hour, minute=0, second=0, microsecond=0)
+        if next_run <= now:
+            next_run += timedelta(days=1)
+        await asyncio.sleep((next_run - now).total_seconds())
+        try:
+            removed = await compact_roster()
+        except Exception:
+            logger.exception("Roster compaction failed, retrying tomorrow")
+            continue
+        if removed is None:
+            logger.warning("Roster compaction failed, retrying tomorrow")
+
+async def export_roster(writer, filters, export_id):
+    """Write the roster shard by shard, one chunk per round trip
+    
+    Every shard snapshots its roster once up front and the chunks page
+    through that snapshot, so the export is not re-read per chunk and rows
+    do not shift between chunks when the sheet changes.
+    """
+    started = await executor.gather('start_export', export_id, filters.get('group'), filters.get('status'))
+    try:
+        if not all(started):
+            return False
+        for shard_id in range(executor.num_shards):
+            while True:
+                rows = await executor.call_shard(shard_id, 'get_roster_chunk', export_id, EXPORT_CHUNK_SIZE)
+                if rows is None:
+                    return False
+                writer.write_rows(rows)
+                if len(rows) < EXPORT_CHUNK_SIZE:
+                    break
+        return True
+    finally:
+        await executor.gather('end_export', export_id)
+
+async def export_events(writer, filters):
+    """Write command history from the ingest queue, one chunk at a time"""
+    for rows in ingest_queue.iter_events(
+        EXPORT_CHUNK_SIZE, filters.get('status'), filters.get('from'), filters.get('to')
+    ):
+        writer.write_rows(rows)
+        # Let other updates run between chunks
+        await asyncio.sleep(0)
+    return True
+
+# Global executor (in-process or sharded)
+executor = None
+
+# Global durable command queue and its processor
+ingest_queue = None
+ingest_processor = None
+
+# Global pinned leaderboard store and the task keeping them current
+leaderboard_pins = None
+leaderboard_updater = None
+
+# Global cached standings for leaderboards and pages
+standings = None
+
+# Global per-user command throttle
+throttle = None
+
+def standings_changed(user_id=None):
+    """Called after writes that may move the standings, user_id is the user written to if known"""
+    standings.bump()
+    leaderboard_updater.mark_dirty()
+    throttle.forget(user_id)
+
+def command_refused(user_id, method, args, reply):
+    """Cache a refused /done, so repeating it is answered without queueing a write"""
+    if method == 'update_task_completion':
+        # Same key throttle_command looks up for /done <task>
+        throttle.remember(user_id, f"done {args[1]}", reply)
+
+async def throttle_command(update, context, command):
+    """Answer repeated or too frequent commands, True when the handler should run"""
+    user = update.effective_user
+    if executor.is_admin(user.id):
+        return True
+    cached = throttle.cached_reply(user.id, ' '.join([command, *context.args]).lower())
+    if cached is not None:
+        await update.message.reply_text(cached)
+        return False
+    wait = throttle.allow(user.id, command)
+    if wait:
+        await update.message.reply_text(f"Slow down! Try /{command} again in {wait} seconds")
+        return False
+    return True
+
+async def enqueue_command(update, user_id, method, *args):
+    """Persist a write command before acknowledging it
+    
+    The processor replies with the result once storage has taken it.
+    """
+    message = update.effective_message
+    depth = ingest_queue.depth()
+    if depth >= ingest_queue.max_depth:
+        await message.reply_text("The bot is very busy right now. Please try again in a moment")
+        return
+    if not ingest_queue.enqueue(update.update_id, user_id, message.chat_id, message.message_id, method, args):
+        # Redelivered update, already queued
+        return
+    ingest_processor.wake()
+    if depth > 0 or not ingest_processor.healthy:
+        await message.reply_text("Queued, will confirm shortly")
+
+async def fetch_leaderboard():
+    """Render the top of every group from the cached standings"""
+    if not await standings.load():
+        return DB_ERROR_MSG
+    return format_leaderboard(standings.rankings)
+
+async def fetch_admin_stats():
+    """Collect admin counters from every shard and render them"""
+    parts = await executor.gather('get_admin_counts')
+    if any(part is None for part in parts):
+        return DB_ERROR_MSG
+    return format_admin_stats(merge_admin_counts(parts))
 
 # Command Handlers
 async def start_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /start command"""
-    welcome_msg = """Welcome to SGI Challenge Tracker!
+    done_lines = "\n".join(f"/done {task.id} - Mark {task.label} complete" for task in TASK_CATALOG.values())
+    task_lines = "\n".join(
+        f"{task.label}: {task.points} points (once {task.describe_frequency()})"
+        for task in TASK_CATALOG.values()
+    )
+    welcome_msg = f"""Welcome to SGI Challenge Tracker!
 
 Commands:
 /register - Join the challenge
-/done daily1 - Mark daily task 1 complete
-/done daily2 - Mark daily task 2 complete  
-/done daily3 - Mark daily task 3 complete
-/done weekly1 - Mark weekly task 1 complete
-/done weekly2 - Mark weekly task 2 complete
+{done_lines}
 /mystatus - Check your progress
 /leaderboard - View rankings
+/leaderboard senior - Browse a group's full ranking
 
 Challenge Info:
 30-day challenge
-Daily tasks: 3 points each (can complete every day)
-Weekly tasks: 5 points each (can complete once per week)
+{task_lines}
 2 strikes = elimination
 6 days per week (Sunday is rest day)
 
@@ -622,6 +2323,8 @@ Good luck!"""
 async def register_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /register command"""
     user = update.effective_user
+    if not await throttle_command(update, context, 'register'):
+        return
     # Check for group argument
     if not context.args or context.args[0].lower() not in ['senior', 'junior', 'finalist']:
         await update.message.reply_text(
@@ -632,12 +2335,13 @@ async def register_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     group = context.args[0].capitalize()
-    success, message = bot_instance.register_challenger(user.id, user.first_name, group)
-    await update.message.reply_text(message)
+    await enqueue_command(update, user.id, 'register_challenger', user.id, user.first_name, group)
 
 async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /done command"""
     user = update.effective_user
+    if not await throttle_command(update, context, 'done'):
+        return
     if not context.args:
         await update.message.reply_text(
             "Please specify the task:\n"
@@ -645,38 +2349,120 @@ async def done_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         )
         return
     task = context.args[0].lower()
-    # Map to column names
-    task_mapping = {
-        'daily1': 'Daily1',
-        'daily2': 'Daily2', 
-        'daily3': 'Daily3',
-        'weekly1': 'Weekly1',
-        'weekly2': 'Weekly2'
-    }
-    if task not in task_mapping:
+    if task not in TASK_CATALOG:
         await update.message.reply_text(
-            "Invalid task. Valid options: daily1, daily2, daily3, weekly1, weekly2"
+            f"Invalid task. Valid options: {', '.join(TASK_CATALOG)}"
         )
         return
-    success, message = bot_instance.update_task_completion(user.id, task_mapping[task])
-    await update.message.reply_text(message)
+    await enqueue_command(update, user.id, 'update_task_completion', user.id, task)
 
 async def mystatus_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /mystatus command"""
     user = update.effective_user
-    status_msg = bot_instance.get_challenger_status(user.id)
+    if not await throttle_command(update, context, 'mystatus'):
+        return
+    status_msg = await executor.call(user.id, 'get_challenger_status', user.id)
+    if status_msg != DB_ERROR_MSG:
+        throttle.remember(user.id, 'mystatus', status_msg)
     await update.message.reply_text(status_msg)
 
 async def leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /leaderboard command"""
-    leaderboard_msg = bot_instance.get_leaderboard()
+    if not await throttle_command(update, context, 'leaderboard'):
+        return
+    if context.args:
+        group = context.args[0].capitalize()
+        if group not in LEADERBOARD_GROUPS:
+            await update.message.reply_text(
+                "Usage: /leaderboard [senior|junior|finalist]\n"
+                "Example: /leaderboard senior"
+            )
+            return
+        page = await standings.render_page(group, 0)
+        if page is None:
+            await update.message.reply_text(DB_ERROR_MSG)
+            return
+        text, keyboard = page
+        await update.message.reply_text(text, reply_markup=keyboard)
+        return
+    # Chats with a live pinned leaderboard get pointed at it instead of a new copy,
+    # once per edit interval; repeats in between only remove the command
+    chat_id = update.effective_chat.id
+    pinned_message_id = leaderboard_pins.get(chat_id)
+    if pinned_message_id:
+        if leaderboard_updater.take_pointer(chat_id):
+            await context.bot.send_message(
+                chat_id,
+                "Live standings are pinned in this chat",
+                reply_to_message_id=pinned_message_id,
+                allow_sending_without_reply=True
+            )
+            return
+        try:
+            await update.message.delete()
+        except TelegramError as e:
+            # The bot needs delete rights in the chat, without them the command just stays
+            logger.info(f"Could not delete /leaderboard in chat {chat_id}: {e}")
+        return
+    leaderboard_msg = await fetch_leaderboard()
     await update.message.reply_text(leaderboard_msg)
 
+async def leaderboard_callback(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle leaderboard paging and "My rank" buttons"""
+    query = update.callback_query
+    _, group, target = query.data.split(':')
+    if group not in LEADERBOARD_GROUPS:
+        await query.answer()
+        return
+    notice = None
+    if target == 'me':
+        position = await standings.find(query.from_user.id)
+        if position is None:
+            await query.answer("You are not on the leaderboard")
+            return
+        group, index = position
+        page_num = index // standings.page_size
+        notice = f"You are #{index + 1} in the {group} group"
+    else:
+        page_num = int(target)
+    page = await standings.render_page(group, page_num)
+    if page is None:
+        await query.answer(DB_ERROR_MSG)
+        return
+    await query.answer(notice)
+    text, keyboard = page
+    if text == query.message.text:
+        return
+    try:
+        await query.edit_message_text(text, reply_markup=keyboard)
+    except BadRequest as e:
+        if 'not modified' not in str(e).lower():
+            raise
+
+async def inline_query_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Answer "@bot <name>" with that person's group, points and rank"""
+    query = update.inline_query
+    matches = await standings.search(query.query.strip().lower(), INLINE_RESULTS_LIMIT)
+    if matches is None:
+        # Don't let Telegram cache an outage
+        await query.answer([], cache_time=0)
+        return
+    results = []
+    for group, index, user in matches:
+        summary = f"{user['name']}: #{index + 1} in the {group} group with {user['points']} pts"
+        results.append(InlineQueryResultArticle(
+            id=str(user['user_id']),
+            title=f"{user['name']} - #{index + 1} {group}",
+            description=f"{user['points']} pts",
+            input_message_content=InputTextMessageContent(summary)
+        ))
+    await query.answer(results, cache_time=INLINE_CACHE_SECONDS)
+
 # Admin Commands
 async def admin_help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_help command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     help_msg = """Admin Commands:
@@ -691,6 +2477,10 @@ async def admin_help_command(update: Update, context: ContextTypes.DEFAULT_TYPE)
 /admin_change_group <user_id> <group> - Change user's group
 /admin_delete_user <user_id> - Delete user from challenge
 /admin_get_id <name> - Get user ID by name
+/admin_export [roster|events] [csv|json] - Download data (filters: group=, status=, from=, to=)
+Send me a .csv file of user_id,name,group lines in private chat - Register users in bulk
+/admin_pin_leaderboard - Keep a live leaderboard pinned in this group
+/admin_unpin_leaderboard - Stop the live leaderboard in this group
 /admin_reset - Reset entire challenge (use with caution!)
 
 Examples:
@@ -707,7 +2497,7 @@ Note: user_id is the Telegram User ID (number), not username."""
 async def admin_strike_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_strike command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 2:
@@ -719,15 +2509,14 @@ async def admin_strike_command(update: Update, context: ContextTypes.DEFAULT_TYP
     try:
         target_user_id = int(context.args[0])
         reason = ' '.join(context.args[1:])
-        success, message = bot_instance.add_strike(target_user_id, reason)
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'add_strike', target_user_id, reason)
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number")
 
 async def admin_remove_strike_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_remove_strike command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 1:
@@ -738,15 +2527,14 @@ async def admin_remove_strike_command(update: Update, context: ContextTypes.DEFA
         return
     try:
         target_user_id = int(context.args[0])
-        success, message = bot_instance.remove_strike(target_user_id)
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'remove_strike', target_user_id)
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number")
 
 async def admin_user_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_user_stats command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 1:
@@ -757,7 +2545,7 @@ async def admin_user_stats_command(update: Update, context: ContextTypes.DEFAULT
         return
     try:
         target_user_id = int(context.args[0])
-        stats_msg = bot_instance.get_user_stats(target_user_id)
+        stats_msg = await executor.call(target_user_id, 'get_user_stats', target_user_id)
         await update.message.reply_text(stats_msg)
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number")
@@ -765,7 +2553,7 @@ async def admin_user_stats_command(update: Update, context: ContextTypes.DEFAULT
 async def admin_add_points_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_add_points command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 2:
@@ -780,15 +2568,14 @@ async def admin_add_points_command(update: Update, context: ContextTypes.DEFAULT
         if points_to_add <= 0:
             await update.message.reply_text("Points must be a positive number")
             return
-        success, message = bot_instance.adjust_points(target_user_id, points_to_add, "add")
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'adjust_points', target_user_id, points_to_add, "add")
     except ValueError:
         await update.message.reply_text("Invalid input. Both user ID and points must be numbers")
 
 async def admin_remove_points_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_remove_points command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 2:
@@ -803,15 +2590,14 @@ async def admin_remove_points_command(update: Update, context: ContextTypes.DEFA
         if points_to_remove <= 0:
             await update.message.reply_text("Points must be a positive number")
             return
-        success, message = bot_instance.adjust_points(target_user_id, points_to_remove, "remove")
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'adjust_points', target_user_id, points_to_remove, "remove")
     except ValueError:
         await update.message.reply_text("Invalid input. Both user ID and points must be numbers")
 
 async def admin_change_group_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_change_group command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 2:
@@ -824,15 +2610,14 @@ async def admin_change_group_command(update: Update, context: ContextTypes.DEFAU
     try:
         target_user_id = int(context.args[0])
         new_group = context.args[1]
-        success, message = bot_instance.change_user_group(target_user_id, new_group)
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'change_user_group', target_user_id, new_group)
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number")
 
 async def admin_delete_user_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_delete_user command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 1:
@@ -844,15 +2629,14 @@ async def admin_delete_user_command(update: Update, context: ContextTypes.DEFAUL
         return
     try:
         target_user_id = int(context.args[0])
-        success, message = bot_instance.delete_user(target_user_id)
-        await update.message.reply_text(message)
+        await enqueue_command(update, target_user_id, 'delete_user', target_user_id)
     except ValueError:
         await update.message.reply_text("Invalid user ID. Must be a number")
 
 async def admin_get_id_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_get_id command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
     if len(context.args) < 1:
@@ -863,10 +2647,12 @@ async def admin_get_id_command(update: Update, context: ContextTypes.DEFAULT_TYP
         return
     
     name = ' '.join(context.args)
-    challenger = bot_instance.find_challenger_by_name(name)
+    # Each shard only searches its own users
+    matches = await executor.gather('find_challenger_by_name', name)
+    challenger = next((match for match in matches if match), None)
     
     if challenger:
-        response_msg = f"Name: {challenger.get('Name', 'Unknown')}, User ID: {challenger.get('User_ID', 'Unknown')}"
+        response_msg = f"Name: {challenger.name}, User ID: {challenger.user_id}"
         await update.message.reply_text(response_msg)
     else:
         await update.message.reply_text(f"No user found with name: {name}")
@@ -874,44 +2660,209 @@ async def admin_get_id_command(update: Update, context: ContextTypes.DEFAULT_TYP
 async def admin_stats_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_stats command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
-    stats_msg = bot_instance.get_admin_stats()
+    stats_msg = await fetch_admin_stats()
+    if stats_msg != DB_ERROR_MSG:
+        stats_msg += "\n\n" + format_throttle_stats(throttle)
     await update.message.reply_text(stats_msg)
 
+async def admin_pin_leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /admin_pin_leaderboard command"""
+    user = update.effective_user
+    if not executor.is_admin(user.id):
+        await update.message.reply_text("You are not authorized to use admin commands")
+        return
+    chat = update.effective_chat
+    if chat.type == 'private':
+        await update.message.reply_text("Use this command in the group chat where the leaderboard should be pinned")
+        return
+    leaderboard_msg = await fetch_leaderboard()
+    if leaderboard_msg == DB_ERROR_MSG:
+        # Never pin the error, the updater would leave it there until the next change
+        await update.message.reply_text(leaderboard_msg)
+        return
+    message = await context.bot.send_message(chat.id, leaderboard_msg)
+    try:
+        await context.bot.pin_chat_message(chat.id, message.message_id, disable_notification=True)
+    except Exception as e:
+        logger.warning(f"Could not pin leaderboard in chat {chat.id}: {e}")
+        await update.message.reply_text("I need permission to pin messages in this chat")
+        return
+    leaderboard_pins.set(chat.id, message.message_id)
+    leaderboard_updater.last_text[chat.id] = leaderboard_msg
+
+async def admin_unpin_leaderboard_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /admin_unpin_leaderboard command"""
+    user = update.effective_user
+    if not executor.is_admin(user.id):
+        await update.message.reply_text("You are not authorized to use admin commands")
+        return
+    chat = update.effective_chat
+    message_id = leaderboard_pins.get(chat.id)
+    if not message_id:
+        await update.message.reply_text("There is no live leaderboard in this chat")
+        return
+    leaderboard_pins.remove(chat.id)
+    leaderboard_updater.last_text.pop(chat.id, None)
+    try:
+        await context.bot.unpin_chat_message(chat.id, message_id)
+    except Exception as e:
+        logger.warning(f"Could not unpin leaderboard in chat {chat.id}: {e}")
+    await update.message.reply_text("Live leaderboard stopped")
+
+async def admin_export_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle /admin_export command"""
+    user = update.effective_user
+    if not executor.is_admin(user.id):
+        await update.message.reply_text("You are not authorized to use admin commands")
+        return
+    try:
+        kind, fmt, filters = parse_export_args(context.args)
+    except ValueError:
+        await update.message.reply_text(
+            "Usage: /admin_export [roster|events] [csv|json] [filters]\n"
+            "Roster filters: group=<group> status=<Active|Eliminated>\n"
+            "Event filters: status=<pending|done|replied|failed|dead> from=YYYY-MM-DD to=YYYY-MM-DD\n"
+            "Example: /admin_export roster csv group=Senior"
+        )
+        return
+    writer = ExportWriter(fmt, ROSTER_EXPORT_FIELDS if kind == 'roster' else EVENT_EXPORT_FIELDS)
+    try:
+        if kind == 'roster':
+            ok = await export_roster(writer, filters, update.update_id)
+        else:
+            ok = await export_events(writer, filters)
+        document = writer.finish()
+        if not ok:
+            await update.message.reply_text(DB_ERROR_MSG)
+            return
+        await update.message.reply_document(
+            document=document,
+            filename=f"{kind}-{date.today().isoformat()}.{fmt}.gz",
+            caption=f"{writer.count} {kind} rows"
+        )
+    finally:
+        writer.close()
+
+async def admin_import_document(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """Handle a CSV upload of user_id,name,group lines"""
+    user = update.effective_user
+    if not executor.is_admin(user.id):
+        await update.message.reply_text("You are not authorized to use admin commands")
+        return
+    document = update.message.document
+    if document.file_size and document.file_size > IMPORT_MAX_BYTES:
+        await update.message.reply_text(f"File too large. The limit is {IMPORT_MAX_BYTES // 1024} KB")
+        return
+    try:
+        data = await (await document.get_file()).download_as_bytearray()
+        text = bytes(data).decode('utf-8-sig')
+    except UnicodeDecodeError:
+        await update.message.reply_text("Could not read the file. Please upload a UTF-8 CSV")
+        return
+    
+    rows, duplicates, invalid = parse_import_csv(text)
+    inserted, skipped, failed = 0, 0, 0
+    if rows:
+        inserted, skipped, failed = await import_challengers(rows)
+        # Some shards may have written even if others failed
+        if inserted:
+            standings_changed()
+    
+    message = (
+        f"Import finished\n\n"
+        f"Inserted: {inserted}\n"
+        f"Skipped (already registered or repeated): {skipped + duplicates}\n"
+        f"Invalid: {len(invalid)}"
+    )
+    if failed:
+        message += f"\nNot saved (storage error): {failed}. Upload the file again to retry them"
+    if invalid:
+        message += "\n\n" + "\n".join(f"Line {line_num}: {reason}" for line_num, reason in invalid[:IMPORT_INVALID_SHOWN])
+        if len(invalid) > IMPORT_INVALID_SHOWN:
+            message += f"\n... and {len(invalid) - IMPORT_INVALID_SHOWN} more"
+    await update.message.reply_text(message)
+
 async def admin_reset_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Handle /admin_reset command"""
     user = update.effective_user
-    if not bot_instance.is_admin(user.id):
+    if not executor.is_admin(user.id):
         await update.message.reply_text("You are not authorized to use admin commands")
         return
-    success, message = bot_instance.reset_challenge()
+    async with ingest_processor.lock:
+        results = await executor.gather('reset_challenge')
+    # Report the first failing shard, if any
+    success, message = next((result for result in results if not result[0]), results[0])
+    standings_changed()
     await update.message.reply_text(message)
 
 async def error_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     """Log errors"""
     logger.warning('Update "%s" caused error "%s"', update, context.error)
 
+# Background tasks started with the application
+background_tasks = []
+
+async def post_init(application):
+    """Start background tasks once the application is initialized"""
+    global ingest_processor, leaderboard_updater
+    leaderboard_updater = LeaderboardUpdater(leaderboard_pins, application.bot, LEADERBOARD_EDIT_INTERVAL)
+    ingest_processor = IngestProcessor(
+        ingest_queue, application.bot, on_change=standings_changed, on_refused=command_refused
+    )
+    if not await executor.call_shard(0, 'prepare_columns'):
+        logger.warning("Task columns are missing, workers will add them on first use")
+    background_tasks.append(asyncio.create_task(ingest_processor.run()))
+    background_tasks.append(asyncio.create_task(leaderboard_updater.run()))
+    background_tasks.append(asyncio.create_task(run_compaction(COMPACT_HOUR)))
+
+async def post_shutdown(application):
+    """Stop background tasks"""
+    for task in background_tasks:
+        task.cancel()
+    await asyncio.gather(*background_tasks, return_exceptions=True)
+    background_tasks.clear()
+
 def main():
     """Run the bot"""
-    global bot_instance
+    global executor, ingest_queue, leaderboard_pins, standings, throttle
     
     # Get configuration from environment variables
     BOT_TOKEN = os.getenv('TELEGRAM_BOT_TOKEN')
     SPREADSHEET_ID = os.getenv('GOOGLE_SPREADSHEET_ID') 
     ADMIN_USER_IDS = os.getenv('ADMIN_USER_IDS')
+    WORKER_PROCESSES = int(os.getenv('WORKER_PROCESSES', '1'))
+    INGEST_DB_PATH = os.getenv('INGEST_DB_PATH', 'sgi_bot.db')
+    INGEST_QUEUE_MAX = int(os.getenv('INGEST_QUEUE_MAX', '500'))
     
     if not all([BOT_TOKEN, SPREADSHEET_ID, ADMIN_USER_IDS]):
         logger.error("Missing required environment variables")
         return
     
     try:
-        # Initialize bot instance
-        bot_instance = SGIBot(SPREADSHEET_ID, ADMIN_USER_IDS)
+        # Initialize bot instance, or shard workers when more than one process is configured
+        if WORKER_PROCESSES > 1:
+            executor = ShardedExecutor(WORKER_PROCESSES, SPREADSHEET_ID, ADMIN_USER_IDS)
+        else:
+            executor = LocalExecutor(SGIBot(SPREADSHEET_ID, ADMIN_USER_IDS))
+        
+        # Write commands are persisted here before they are acknowledged
+        ingest_queue = IngestQueue(INGEST_DB_PATH, INGEST_QUEUE_MAX)
+        leaderboard_pins = LeaderboardPins(INGEST_DB_PATH)
+        standings = Standings(LEADERBOARD_PAGE_SIZE, STANDINGS_MAX_AGE)
+        throttle = CommandThrottle(parse_throttle_limits(THROTTLE_LIMITS), RESPONSE_CACHE_SECONDS)
         
         # Create application (PTB v20+)
-        application = Application.builder().token(BOT_TOKEN).build()
+        # Handlers run concurrently so their reads can share a fetch (and wait on
+        # different shards); writes are still applied in order by the ingest queue
+        application = (
+            Application.builder().token(BOT_TOKEN)
+            .post_init(post_init).post_shutdown(post_shutdown)
+            .concurrent_updates(True)
+            .build()
+        )
         
         # Add command handlers
         application.add_handler(CommandHandler("start", start_command))
@@ -919,6 +2870,8 @@ def main():
         application.add_handler(CommandHandler("done", done_command))
         application.add_handler(CommandHandler("mystatus", mystatus_command))
         application.add_handler(CommandHandler("leaderboard", leaderboard_command))
+        application.add_handler(CallbackQueryHandler(leaderboard_callback, pattern=r"^lb:"))
+        application.add_handler(InlineQueryHandler(inline_query_handler))
         
         # Admin commands
         application.add_handler(CommandHandler("admin_help", admin_help_command))
@@ -931,14 +2884,24 @@ def main():
         application.add_handler(CommandHandler("admin_delete_user", admin_delete_user_command))
         application.add_handler(CommandHandler("admin_get_id", admin_get_id_command))
         application.add_handler(CommandHandler("admin_stats", admin_stats_command))
+        application.add_handler(CommandHandler("admin_pin_leaderboard", admin_pin_leaderboard_command))
+        application.add_handler(CommandHandler("admin_unpin_leaderboard", admin_unpin_leaderboard_command))
+        application.add_handler(CommandHandler("admin_export", admin_export_command))
         application.add_handler(CommandHandler("admin_reset", admin_reset_command))
+        application.add_handler(MessageHandler(
+            filters.ChatType.PRIVATE & filters.Document.FileExtension("csv"), admin_import_document
+        ))
         
         # Error handler
         application.add_error_handler(error_handler)
         
-        # Run the bot
+        # Run the bot; pending updates are kept since queued commands are idempotent by update_id
         logger.info("SGI Bot starting...")
-        application.run_polling(drop_pending_updates=True)
+        executor.start()
+        try:
+            application.run_polling(drop_pending_updates=False)
+        finally:
+            executor.stop()
         
     except Exception as e:
         logger.error(f"Failed to start bot: {e}")
@@ -0,0 +1,121 @@
+import os
+import sys
+from unittest import mock
+
+import gspread
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+# The module connects to Google Sheets on import, tests never talk to it
+with mock.patch.object(gspread, 'service_account'):
+    import sgi_bot_phase1  # noqa: E402
+
+
+HEADERS = ['Name', 'User_ID', 'Group', 'Current_Points', 'Strikes', 'Status']
+
+
+def make_record(user_id, name='Test', group='Senior', points=0, strikes=0, status='Active', **extra):
+    """One get_all_records() dict"""
+    record = {
+        'Name': name,
+        'User_ID': user_id,
+        'Group': group,
+        'Current_Points': points,
+        'Strikes': strikes,
+        'Status': status
+    }
+    record.update(extra)
+    return record
+
+
+class FakeSheet:
+    """In-memory stand-in for the gspread worksheet calls the bot makes"""
+
+    id = 0
+
+    def __init__(self, headers=HEADERS):
+        self.rows = [list(headers)]
+        self.col_count = len(headers)
+        self.calls = []
+        # Set to hold get_all_records() until released
+        self.hold = None
+
+    def get_all_records(self):
+        self.calls.append('get_all_records')
+        headers = self.rows[0]
+        snapshot = [row + [''] * (len(headers) - len(row)) for row in self.rows[1:]]
+        if self.hold:
+            self.hold.wait(5)
+        return [dict(zip(headers, row)) for row in snapshot]
+
+    def row_values(self, row_num):
+        self.calls.append('row_values')
+        return list(self.rows[row_num - 1])
+
+    def col_values(self, col):
+        self.calls.append('col_values')
+        return [row[col - 1] if len(row) >= col else '' for row in self.rows]
+
+    def append_row(self, row, **kwargs):
+        self.calls.append('append_row')
+        self.rows.append(list(row))
+
+    def append_rows(self, rows, **kwargs):
+        self.calls.append('append_rows')
+        self.rows.extend(list(row) for row in rows)
+
+    def update_cell(self, row_num, col, value):
+        self.calls.append('update_cell')
+        self.set(row_num, col, value)
+
+    def update_cells(self, cells, **kwargs):
+        self.calls.append('update_cells')
+        for cell in cells:
+            self.set(cell.row, cell.col, cell.value)
+
+    def add_cols(self, count):
+        self.calls.append('add_cols')
+        self.col_count += count
+
+    def set(self, row_num, col, value):
+        row = self.rows[row_num - 1]
+        row.extend([''] * (col - len(row)))
+        row[col - 1] = value
+
+
+class FakeSpreadsheet:
+    def __init__(self, sheet):
+        self.sheet1 = sheet
+
+    def fetch_sheet_metadata(self, params=None):
+        return {'sheets': [{'properties': {
+            'sheetId': self.sheet1.id,
+            'gridProperties': {'columnCount': self.sheet1.col_count}
+        }}]}
+
+    def batch_update(self, body):
+        self.sheet1.calls.append('batch_update')
+        for request in body['requests']:
+            span = request['deleteDimension']['range']
+            del self.sheet1.rows[span['startIndex']:span['endIndex']]
+
+
+@pytest.fixture
+def sheet():
+    return FakeSheet()
+
+
+@pytest.fixture
+def sgi_bot(sheet):
+    """An SGIBot wired to the fake sheet"""
+    bot = sgi_bot_phase1.SGIBot('spreadsheet', '1')
+    bot.spreadsheet = FakeSpreadsheet(sheet)
+    bot.sheet = sheet
+    return bot
+
+
+def add_user(sheet, user_id, **fields):
+    record = make_record(user_id, **fields)
+    sheet.rows.append([record.get(header, '') for header in sheet.rows[0]])
+    return len(sheet.rows)
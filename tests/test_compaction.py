@@ -0,0 +1,70 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import sgi_bot_phase1
+from conftest import add_user
+from sgi_bot_phase1 import LocalExecutor, compact_roster, run_compaction
+
+
+@pytest.fixture
+def local_executor(sgi_bot, monkeypatch):
+    executor = LocalExecutor(sgi_bot)
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', executor)
+    monkeypatch.setattr(sgi_bot_phase1, 'ingest_processor', SimpleNamespace(lock=asyncio.Lock()))
+    return executor
+
+
+def test_writes_after_compaction_hit_the_moved_rows(local_executor, sgi_bot, sheet):
+    add_user(sheet, 1, status='Deleted')
+    add_user(sheet, 2, status='Deleted')
+    add_user(sheet, 3, points=5)
+    add_user(sheet, 4, points=7)
+    # Readers have cached the pre-compaction row numbers
+    assert sgi_bot.get_roster().get(3).row_num == 4
+
+    assert asyncio.run(compact_roster()) == 2
+    assert sgi_bot.run('adjust_points', 3, 1, 'add')[0]
+    assert sgi_bot.run('adjust_points', 4, 1, 'add')[0]
+
+    assert [(row[1], row[3]) for row in sheet.rows[1:]] == [(3, 6), (4, 8)]
+
+
+def test_failed_compaction_still_reloads(local_executor, sgi_bot, sheet):
+    add_user(sheet, 3)
+    sgi_bot.get_roster()
+
+    def timed_out(body):
+        raise TimeoutError('read timed out')
+
+    sgi_bot.spreadsheet.batch_update = timed_out
+    sheet.rows[1][5] = 'Deleted'
+    assert asyncio.run(compact_roster()) is None
+    sgi_bot.get_roster()
+    assert sheet.calls.count('get_all_records') == 2
+
+
+def test_compaction_loop_survives_errors(monkeypatch):
+    outcomes = iter([RuntimeError('shard died'), 3])
+    runs = []
+
+    async def fake_compact():
+        runs.append(1)
+        outcome = next(outcomes)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+    sleeps = []
+
+    async def fake_sleep(seconds):
+        sleeps.append(seconds)
+        if len(sleeps) > 2:
+            raise asyncio.CancelledError
+
+    monkeypatch.setattr(sgi_bot_phase1, 'compact_roster', fake_compact)
+    monkeypatch.setattr(sgi_bot_phase1.asyncio, 'sleep', fake_sleep)
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(run_compaction(3))
+    assert len(runs) == 2
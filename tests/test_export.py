@@ -0,0 +1,113 @@
+import asyncio
+import csv
+import gzip
+import io
+import json
+from datetime import datetime
+
+import pytest
+
+import sgi_bot_phase1
+from conftest import add_user
+from sgi_bot_phase1 import ROSTER_EXPORT_FIELDS, ExportWriter, LocalExecutor, export_roster, parse_export_args
+
+
+def test_parse_export_args_defaults_to_roster_csv():
+    assert parse_export_args([]) == ('roster', 'csv', {})
+
+
+def test_parse_export_args_roster_filters():
+    assert parse_export_args(['roster', 'JSON', 'group=senior', 'status=active']) == (
+        'roster', 'json', {'group': 'Senior', 'status': 'Active'}
+    )
+
+
+def test_parse_export_args_event_date_range_includes_the_last_day():
+    kind, fmt, filters = parse_export_args(['events', 'from=2026-03-01', 'to=2026-03-02', 'status=dead'])
+    assert (kind, fmt) == ('events', 'csv')
+    assert filters['status'] == 'dead'
+    assert filters['from'] == datetime(2026, 3, 1).timestamp()
+    assert filters['to'] == datetime(2026, 3, 3).timestamp()
+
+
+@pytest.mark.parametrize('args', [
+    ['users'],
+    ['roster', 'xml'],
+    ['roster', 'csv', 'extra'],
+    ['roster', 'group=Nobody'],
+    ['roster', 'status=Deleted'],
+    ['events', 'group=Senior'],
+    ['events', 'from=yesterday'],
+])
+def test_parse_export_args_rejects_bad_input(args):
+    with pytest.raises(ValueError):
+        parse_export_args(args)
+
+
+def read_document(document):
+    return gzip.decompress(document.read()).decode('utf-8')
+
+
+def test_writer_streams_csv_and_json():
+    rows = [{'user_id': 1, 'name': 'Zoë'}, {'user_id': 2, 'name': 'Bo, Jr'}]
+
+    writer = ExportWriter('csv', ['user_id', 'name'])
+    writer.write_rows(rows)
+    text = read_document(writer.finish())
+    writer.close()
+    assert list(csv.DictReader(io.StringIO(text))) == [{'user_id': '1', 'name': 'Zoë'}, {'user_id': '2', 'name': 'Bo, Jr'}]
+
+    writer = ExportWriter('json', ['user_id', 'name'])
+    writer.write_rows(rows)
+    assert json.loads(read_document(writer.finish())) == rows
+    assert writer.count == 2
+    writer.close()
+
+
+def test_writer_close_releases_an_unfinished_export():
+    writer = ExportWriter('csv', ['user_id'])
+    writer.write_rows([{'user_id': 1}])
+    writer.close()
+    assert writer.gzip.closed
+    assert writer.file.closed
+
+
+@pytest.fixture
+def local_executor(sgi_bot, monkeypatch):
+    executor = LocalExecutor(sgi_bot)
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', executor)
+    monkeypatch.setattr(sgi_bot_phase1, 'EXPORT_CHUNK_SIZE', 2)
+    return executor
+
+
+def test_export_pages_through_one_snapshot(local_executor, sgi_bot, sheet):
+    for user_id in range(1, 6):
+        add_user(sheet, user_id, group='Junior' if user_id == 3 else 'Senior')
+    original = sgi_bot.get_roster_chunk
+
+    def get_roster_chunk(export_id, limit):
+        # A registration lands and the cached read is dropped between chunks
+        add_user(sheet, 100 + len(sheet.rows))
+        sgi_bot.reads.invalidate()
+        return original(export_id, limit)
+
+    sgi_bot.get_roster_chunk = get_roster_chunk
+    writer = ExportWriter('csv', ROSTER_EXPORT_FIELDS)
+    assert asyncio.run(export_roster(writer, {'group': 'Senior'}, 1))
+    text = read_document(writer.finish())
+    writer.close()
+
+    assert [row['user_id'] for row in csv.DictReader(io.StringIO(text))] == ['1', '2', '4', '5']
+    assert sheet.calls.count('get_all_records') == 1
+    assert sgi_bot.exports == {}
+
+
+def test_export_fails_when_a_shard_cannot_read(local_executor, sgi_bot, sheet):
+    def broken():
+        raise RuntimeError('quota')
+
+    sheet.get_all_records = broken
+    writer = ExportWriter('csv', ROSTER_EXPORT_FIELDS)
+    assert not asyncio.run(export_roster(writer, {}, 1))
+    writer.close()
+    assert sgi_bot.exports == {}
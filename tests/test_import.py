@@ -0,0 +1,89 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import sgi_bot_phase1
+from conftest import add_user
+from sgi_bot_phase1 import ShardTimeout, import_challengers, parse_import_csv
+
+
+def test_parse_import_csv_accepts_header_and_normalises_fields():
+    rows, duplicates, invalid = parse_import_csv(
+        "user_id,name,group\n"
+        " 11 , Ann Lee , senior\n"
+        "\n"
+        "12,Bo,JUNIOR\n"
+    )
+    assert rows == [
+        {'user_id': 11, 'name': 'Ann Lee', 'group': 'Senior'},
+        {'user_id': 12, 'name': 'Bo', 'group': 'Junior'}
+    ]
+    assert duplicates == 0
+    assert invalid == []
+
+
+def test_parse_import_csv_reports_invalid_lines_by_number():
+    rows, duplicates, invalid = parse_import_csv(
+        "11,Ann\n"
+        "abc,Bo,Senior\n"
+        "13,,Senior\n"
+        "14,Cy,Gold\n"
+        '15,"Lee, Dee",Finalist\n'
+    )
+    assert rows == [{'user_id': 15, 'name': 'Lee, Dee', 'group': 'Finalist'}]
+    assert [line_num for line_num, reason in invalid] == [1, 2, 3, 4]
+    assert "'abc'" in invalid[1][1]
+    assert "'Gold'" in invalid[3][1]
+
+
+def test_parse_import_csv_keeps_the_first_line_of_a_repeated_user():
+    rows, duplicates, invalid = parse_import_csv("11,Ann,Senior\n11,Ann Again,Junior\n11,Ann,Senior\n")
+    assert rows == [{'user_id': 11, 'name': 'Ann', 'group': 'Senior'}]
+    assert duplicates == 2
+
+
+class ImportExecutor:
+    """Two shards by user ID parity, shard 1 can be made to fail"""
+
+    num_shards = 2
+
+    def __init__(self, bot, failure):
+        self.bot = bot
+        self.failure = failure
+
+    def shard_of(self, user_id):
+        return user_id % 2
+
+    async def call_shard(self, shard_id, method, rows):
+        if shard_id == 1:
+            if isinstance(self.failure, Exception):
+                raise self.failure
+            return self.failure
+        return self.bot.run(method, rows)
+
+
+@pytest.fixture
+def import_setup(monkeypatch):
+    monkeypatch.setattr(sgi_bot_phase1, 'ingest_processor', SimpleNamespace(lock=asyncio.Lock()))
+
+    def install(bot, failure):
+        monkeypatch.setattr(sgi_bot_phase1, 'executor', ImportExecutor(bot, failure))
+
+    return install
+
+
+@pytest.mark.parametrize('failure', [None, ShardTimeout('shard 1 timed out')])
+def test_import_reports_failed_shards_and_keeps_the_rest(import_setup, sgi_bot, sheet, failure):
+    import_setup(sgi_bot, failure)
+    add_user(sheet, 2)
+    rows, _, _ = parse_import_csv("1,Ann,Senior\n2,Bo,Senior\n3,Cy,Junior\n4,Di,Junior\n")
+
+    assert asyncio.run(import_challengers(rows)) == (1, 1, 2)
+    assert [row[1] for row in sheet.rows[1:]] == [2, '4']
+
+
+def test_import_with_every_shard_healthy(import_setup, sgi_bot, sheet):
+    import_setup(sgi_bot, (1, 0))
+    rows, _, _ = parse_import_csv("1,Ann,Senior\n2,Bo,Senior\n")
+    assert asyncio.run(import_challengers(rows)) == (2, 0, 0)
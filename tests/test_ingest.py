@@ -0,0 +1,186 @@
+import asyncio
+
+import pytest
+
+import sgi_bot_phase1
+from conftest import add_user
+from sgi_bot_phase1 import (
+    ALREADY_APPLIED_MSG, COMMAND_FAILED_MSG, COMMAND_TIMEOUT_MSG, DB_ERROR_MSG,
+    IngestProcessor, IngestQueue, LocalExecutor, REGISTER_ERROR_MSG, ShardTimeout
+)
+
+
+@pytest.fixture
+def queue(tmp_path):
+    return IngestQueue(str(tmp_path / 'queue.db'), max_depth=10)
+
+
+def statuses(queue):
+    return dict(queue.conn.execute("SELECT update_id, status FROM ingest_queue").fetchall())
+
+
+class ScriptedExecutor:
+    """Executor answering each update from a script: a reply tuple or an exception"""
+
+    def __init__(self, script):
+        self.script = script
+        self.calls = []
+
+    def shard_of(self, user_id):
+        return 0
+
+    async def call(self, user_id, method, update_id, *args):
+        self.calls.append(update_id)
+        outcome = self.script[update_id]
+        if isinstance(outcome, list):
+            outcome = outcome.pop(0)
+        if isinstance(outcome, Exception):
+            raise outcome
+        return outcome
+
+
+def test_redelivered_updates_are_queued_once(queue):
+    assert queue.enqueue(1, 7, 5, 10, 'update_task_completion', [7, 'daily1'])
+    assert not queue.enqueue(1, 7, 5, 10, 'update_task_completion', [7, 'daily1'])
+    assert queue.enqueue(2, 8, 5, 11, 'add_strike', [8, 'spam'])
+
+    assert queue.depth() == 2
+    assert queue.pending(10) == [
+        (1, 7, 'update_task_completion', [7, 'daily1'], 0),
+        (2, 8, 'add_strike', [8, 'spam'], 0)
+    ]
+
+
+def test_reply_flow_for_done_and_dead_commands(queue):
+    queue.enqueue(1, 7, 5, 10, 'delete_user', [7])
+    queue.enqueue(2, 8, 5, 11, 'delete_user', [8])
+    queue.mark_done(1, 'ok')
+    queue.mark_dead(2, COMMAND_FAILED_MSG)
+
+    assert queue.unreplied(10) == [(1, 5, 10, 'ok'), (2, 5, 11, COMMAND_FAILED_MSG)]
+    queue.mark_replied(1)
+    queue.mark_replied(2)
+    assert statuses(queue) == {1: 'replied', 2: 'dead'}
+    assert queue.depth() == 0
+
+
+def test_storage_failures_retry_then_dead_letter(queue, monkeypatch):
+    queue.enqueue(1, 7, 5, 10, 'add_strike', [7, 'spam'])
+    queue.enqueue(2, 8, 5, 11, 'add_strike', [8, 'spam'])
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', ScriptedExecutor({
+        1: (False, DB_ERROR_MSG),
+        2: (True, 'Strike added')
+    }))
+    processor = IngestProcessor(queue, None, max_attempts=3)
+
+    async def drain():
+        results = []
+        for _ in range(4):
+            results.append(await processor.process_shard(queue.pending(10)))
+        return results
+
+    assert asyncio.run(drain()) == [False, False, False, True]
+    assert statuses(queue) == {1: 'failed', 2: 'done'}
+    assert queue.unreplied(10)[0][3] == COMMAND_FAILED_MSG
+
+
+def test_bugs_are_dead_lettered_without_blocking_the_shard(queue, monkeypatch):
+    queue.enqueue(1, 7, 5, 10, 'add_strike', [7, 'spam'])
+    queue.enqueue(2, 8, 5, 11, 'add_strike', [8, 'spam'])
+    executor = ScriptedExecutor({1: KeyError('Status'), 2: (True, 'Strike added')})
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', executor)
+    changed = []
+    processor = IngestProcessor(queue, None, on_change=changed.append)
+
+    assert asyncio.run(processor.process_shard(queue.pending(10)))
+
+    assert executor.calls == [1, 2]
+    assert statuses(queue) == {1: 'failed', 2: 'done'}
+    assert changed == [8]
+
+
+def test_timed_out_commands_are_not_run_again(queue, monkeypatch):
+    queue.enqueue(1, 7, 5, 10, 'adjust_points', [7, 5, 'add'])
+    executor = ScriptedExecutor({1: ShardTimeout('slow')})
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', executor)
+    processor = IngestProcessor(queue, None)
+
+    assert asyncio.run(processor.process_shard(queue.pending(10)))
+
+    assert queue.pending(10) == []
+    assert queue.unreplied(10) == [(1, 5, 10, COMMAND_TIMEOUT_MSG)]
+
+
+def test_write_methods_raise_on_bugs_instead_of_reporting_storage_errors(sgi_bot, sheet):
+    add_user(sheet, 7)
+    sheet.update_cells = lambda cells, **kwargs: {}['missing']
+
+    with pytest.raises(KeyError):
+        sgi_bot.run('run_command', 1, 'adjust_points', 7, 5, 'add')
+
+
+def test_replayed_command_is_applied_once(sgi_bot, sheet):
+    add_user(sheet, 7, points=10)
+
+    assert sgi_bot.run('run_command', 41, 'adjust_points', 7, 5, 'add') == (True, 'Points added: 5. New total: 15')
+    # Crash before the queue recorded it: the same update runs again
+    assert sgi_bot.run('run_command', 41, 'adjust_points', 7, 5, 'add') == (True, ALREADY_APPLIED_MSG)
+    assert sgi_bot.run('run_command', 42, 'adjust_points', 7, 5, 'add') == (True, 'Points added: 5. New total: 20')
+
+    record = dict(zip(sheet.rows[0], sheet.rows[1]))
+    assert record['Current_Points'] == 20
+    assert record['Last_Update_ID'] == 42
+
+
+def test_replayed_registration_is_applied_once(sgi_bot, sheet):
+    assert sgi_bot.run('run_command', 5, 'register_challenger', 7, 'Ann', 'Senior')[0]
+    assert sgi_bot.run('run_command', 5, 'register_challenger', 7, 'Ann', 'Senior') == (True, ALREADY_APPLIED_MSG)
+    assert len(sheet.rows) == 2
+
+
+def test_processor_replay_after_crash(queue, sgi_bot, sheet, monkeypatch):
+    add_user(sheet, 7, strikes=0)
+    queue.enqueue(1, 7, 5, 10, 'add_strike', [7, 'spam'])
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', LocalExecutor(sgi_bot))
+    processor = IngestProcessor(queue, None)
+    rows = queue.pending(10)
+
+    # The first run wrote the sheet but crashed before mark_done
+    asyncio.run(processor.process_shard(rows))
+    queue.conn.execute("UPDATE ingest_queue SET status = 'pending'")
+    asyncio.run(processor.process_shard(queue.pending(10)))
+
+    record = dict(zip(sheet.rows[0], sheet.rows[1]))
+    assert record['Strikes'] == 1
+    assert queue.unreplied(10) == [(1, 5, 10, ALREADY_APPLIED_MSG)]
+
+
+def test_sheet_outage_is_retried_through_the_real_executor(queue, sgi_bot, sheet, monkeypatch):
+    add_user(sheet, 7)
+    queue.enqueue(1, 7, 5, 10, 'update_task_completion', [7, 'daily1'])
+    queue.enqueue(2, 8, 5, 11, 'register_challenger', [8, 'Bo', 'Senior'])
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', LocalExecutor(sgi_bot))
+    processor = IngestProcessor(queue, None)
+    records = sheet.get_all_records
+
+    def outage():
+        raise ConnectionError('Sheets unreachable')
+
+    sheet.get_all_records = outage
+    assert not asyncio.run(processor.process_shard(queue.pending(10)))
+    assert not asyncio.run(processor.process_shard(queue.pending(10)))
+    # The shard stops at the first failure to keep its commands in order
+    assert [row[4] for row in queue.pending(10)] == [2, 0]
+
+    sheet.get_all_records = records
+    assert asyncio.run(processor.process_shard(queue.pending(10)))
+    assert statuses(queue) == {1: 'done', 2: 'done'}
+    assert len(sheet.rows) == 3
+
+
+def test_registration_during_an_outage_asks_to_retry(sgi_bot, sheet):
+    def outage():
+        raise ConnectionError('Sheets unreachable')
+
+    sheet.get_all_records = outage
+    assert sgi_bot.run('run_command', 5, 'register_challenger', 8, 'Bo', 'Senior') == (False, REGISTER_ERROR_MSG)
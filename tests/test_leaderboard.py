@@ -0,0 +1,74 @@
+import asyncio
+from types import SimpleNamespace
+from unittest import mock
+
+import pytest
+
+import sgi_bot_phase1
+from sgi_bot_phase1 import DB_ERROR_MSG, LeaderboardPins, admin_pin_leaderboard_command
+
+
+@pytest.fixture
+def pin_setup(tmp_path, monkeypatch):
+    pins = LeaderboardPins(str(tmp_path / 'pins.db'))
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', SimpleNamespace(is_admin=lambda user_id: True))
+    monkeypatch.setattr(sgi_bot_phase1, 'leaderboard_pins', pins)
+    monkeypatch.setattr(sgi_bot_phase1, 'leaderboard_updater', SimpleNamespace(last_text={}))
+    update = SimpleNamespace(
+        effective_user=SimpleNamespace(id=1),
+        effective_chat=SimpleNamespace(id=-100, type='supergroup'),
+        message=SimpleNamespace(reply_text=mock.AsyncMock())
+    )
+    context = SimpleNamespace(bot=SimpleNamespace(
+        send_message=mock.AsyncMock(return_value=SimpleNamespace(message_id=55)),
+        pin_chat_message=mock.AsyncMock()
+    ))
+    return pins, update, context
+
+
+def test_pin_posts_and_records_the_leaderboard(pin_setup, monkeypatch):
+    pins, update, context = pin_setup
+    monkeypatch.setattr(sgi_bot_phase1, 'fetch_leaderboard', mock.AsyncMock(return_value='SGI Challenge Leaderboard'))
+
+    asyncio.run(admin_pin_leaderboard_command(update, context))
+
+    context.bot.pin_chat_message.assert_awaited_once_with(-100, 55, disable_notification=True)
+    assert pins.get(-100) == 55
+    assert sgi_bot_phase1.leaderboard_updater.last_text == {-100: 'SGI Challenge Leaderboard'}
+
+
+def test_pin_refuses_to_pin_a_storage_error(pin_setup, monkeypatch):
+    pins, update, context = pin_setup
+    monkeypatch.setattr(sgi_bot_phase1, 'fetch_leaderboard', mock.AsyncMock(return_value=DB_ERROR_MSG))
+
+    asyncio.run(admin_pin_leaderboard_command(update, context))
+
+    update.message.reply_text.assert_awaited_once_with(DB_ERROR_MSG)
+    context.bot.send_message.assert_not_awaited()
+    context.bot.pin_chat_message.assert_not_awaited()
+    assert pins.get(-100) is None
+    assert sgi_bot_phase1.leaderboard_updater.last_text == {}
+
+
+def test_leaderboard_points_at_the_pin_once_per_interval(pin_setup, monkeypatch):
+    pins, update, context = pin_setup
+    pins.set(-100, 55)
+    updater = sgi_bot_phase1.LeaderboardUpdater(pins, None, interval=30)
+    monkeypatch.setattr(sgi_bot_phase1, 'leaderboard_updater', updater)
+    monkeypatch.setattr(sgi_bot_phase1, 'throttle_command', mock.AsyncMock(return_value=True))
+    update.message.delete = mock.AsyncMock()
+    context.args = []
+
+    for _ in range(3):
+        asyncio.run(sgi_bot_phase1.leaderboard_command(update, context))
+
+    context.bot.send_message.assert_awaited_once_with(
+        -100, "Live standings are pinned in this chat",
+        reply_to_message_id=55, allow_sending_without_reply=True
+    )
+    assert update.message.delete.await_count == 2
+    update.message.reply_text.assert_not_awaited()
+
+    updater.last_pointer[-100] -= 30
+    asyncio.run(sgi_bot_phase1.leaderboard_command(update, context))
+    assert context.bot.send_message.await_count == 2
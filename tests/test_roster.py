@@ -0,0 +1,121 @@
+from datetime import date
+
+from conftest import add_user, make_record
+from sgi_bot_phase1 import (
+    RECORD_ERROR_MSG, TASK_CATALOG, Challenger, Group, Roster, Status, current_stamps, legacy_task_state,
+    shard_for_user
+)
+
+
+def test_rows_are_parsed_into_typed_challengers():
+    roster = Roster.from_records([
+        make_record('7', name='Ann', group='senior', points='12', strikes='1', status='eliminated'),
+        make_record(8, name='Bob', group='Junior')
+    ])
+
+    ann = roster.get(7)
+    assert ann.row_num == 2
+    assert (ann.user_id, ann.name, ann.points, ann.strikes) == (7, 'Ann', 12, 1)
+    assert ann.group is Group.SENIOR
+    assert ann.status is Status.ELIMINATED
+    assert not ann.is_active
+    assert roster.get('8').row_num == 3
+    assert len(roster) == 2
+
+
+def test_blank_and_deleted_rows_are_skipped():
+    roster = Roster.from_records([
+        make_record('', name='', group='', points='', strikes='', status=''),
+        make_record(7, status='Deleted'),
+        make_record(8, group='', status='Deleted'),
+        make_record(9)
+    ])
+
+    assert [challenger.user_id for challenger in roster] == [9]
+    assert roster.invalid_rows == []
+    assert 7 not in roster
+    assert 8 not in roster
+
+
+def test_malformed_rows_stay_indexed_by_user_id():
+    roster = Roster.from_records([
+        make_record(7, group=''),
+        make_record(8, points='lots'),
+        make_record('not a number'),
+        make_record(9)
+    ])
+
+    assert [row_num for row_num, reason in roster.invalid_rows] == [2, 3, 4]
+    assert roster.get(7) is None
+    assert 7 in roster and 8 in roster and 9 in roster
+    assert roster.is_invalid(7) and roster.is_invalid('8')
+    assert not roster.is_invalid(9)
+
+
+def test_owns_user_filters_valid_and_malformed_rows():
+    records = [make_record(1), make_record(2), make_record(3, group=''), make_record(4, group=''), make_record('x')]
+    odd = Roster.from_records(records, owns_user=lambda user_id: shard_for_user(user_id, 2) == 1)
+    even = Roster.from_records(records, owns_user=lambda user_id: shard_for_user(user_id, 2) == 0)
+
+    assert [challenger.user_id for challenger in odd] == [1]
+    assert 3 in odd
+    assert 2 not in odd
+    # Malformed rows are only reported by the shard that owns them,
+    # rows without a usable User_ID by shard 0
+    assert [row_num for row_num, reason in odd.invalid_rows] == [4]
+    assert [row_num for row_num, reason in even.invalid_rows] == [5, 6]
+
+
+def test_other_shards_rows_are_not_parsed(monkeypatch):
+    parsed = []
+    from_record = Challenger.from_record.__func__
+
+    def counting(cls, row_num, record):
+        parsed.append(row_num)
+        return from_record(cls, row_num, record)
+
+    monkeypatch.setattr(Challenger, 'from_record', classmethod(counting))
+    Roster.from_records([make_record(user_id) for user_id in range(1, 9)],
+                        owns_user=lambda user_id: shard_for_user(user_id, 4) == 1)
+    assert parsed == [2, 6]
+
+
+def test_unparseable_legacy_date_counts_as_not_done():
+    today = date.today()
+    record = make_record(
+        7,
+        Daily1_Last='25/09/2025',
+        Daily2_Last=today.isoformat(),
+        Weekly1_Week='week 39'
+    )
+    roster = Roster.from_records([record])
+
+    challenger = roster.get(7)
+    stamps = current_stamps()
+    assert not challenger.is_done(TASK_CATALOG['daily1'], stamps)
+    assert challenger.is_done(TASK_CATALOG['daily2'], stamps)
+    assert not challenger.is_done(TASK_CATALOG['weekly1'], stamps)
+    assert legacy_task_state({'Daily1_Last': 'yesterday'}) == {}
+
+
+def test_register_rejects_user_with_malformed_row(sgi_bot, sheet):
+    add_user(sheet, 7, group='')
+
+    success, message = sgi_bot.run('register_challenger', 7, 'Ann', 'Senior')
+
+    assert not success
+    assert 'already registered' in message
+    assert 'append_row' not in sheet.calls
+    assert sgi_bot.run('get_challenger_status', 7) == RECORD_ERROR_MSG
+
+
+def test_import_skips_users_with_malformed_rows(sgi_bot, sheet):
+    add_user(sheet, 7, group='')
+
+    inserted, skipped = sgi_bot.run('import_challengers', [
+        {'user_id': 7, 'name': 'Ann', 'group': 'Senior'},
+        {'user_id': 8, 'name': 'Bob', 'group': 'Junior'}
+    ])
+
+    assert (inserted, skipped) == (1, 1)
+    assert [row[1] for row in sheet.rows[1:]] == [7, '8']
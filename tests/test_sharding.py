@@ -0,0 +1,60 @@
+import pytest
+
+from conftest import FakeSheet, make_record
+from sgi_bot_phase1 import ShardedExecutor, merge_admin_counts, merge_rankings, shard_for_user
+
+
+def test_users_hash_to_a_stable_shard():
+    assert shard_for_user(7, 4) == 3
+    assert shard_for_user('8', 4) == 0
+    assert shard_for_user('', 4) == 0
+
+
+def test_receiver_splits_one_download_by_shard():
+    executor = ShardedExecutor(2, 'spreadsheet', '1')
+    executor.sheet = FakeSheet()
+    executor.sheet.get_all_records = lambda: [make_record(1), make_record(2), make_record(3)]
+
+    version, rows = executor.fetch_rows()
+
+    assert [[row_num for row_num, record in shard] for shard in rows] == [[3], [2, 4]]
+
+
+def test_rows_are_sent_to_a_shard_once_per_version():
+    executor = ShardedExecutor(2, 'spreadsheet', '1')
+    fetched = (1, [['rows of 0'], ['rows of 1']])
+
+    assert executor.snapshot_for(0, fetched) == (1, ['rows of 0'])
+    assert executor.snapshot_for(0, fetched) == (1, None)
+    assert executor.snapshot_for(1, fetched) == (1, ['rows of 1'])
+    assert executor.snapshot_for(0, (2, [['new rows'], []])) == (2, ['new rows'])
+    assert executor.snapshot_for(0, None) is None
+
+
+def test_shard_reads_use_the_rows_it_was_sent(sgi_bot, sheet):
+    rows = [(2, make_record(7, name='Ann', points=5)), (3, make_record(9, name='Bob', points=8))]
+
+    rankings = sgi_bot.run_on_rows(1, rows, 'get_rankings')
+    # The parsed version is reused when only the version number comes along
+    assert sgi_bot.run_on_rows(1, None, 'get_user_stats', 9).startswith('User Statistics')
+
+    assert [entry['name'] for entry in rankings['Senior']] == ['Bob', 'Ann']
+    assert sheet.calls == []
+    with pytest.raises(RuntimeError):
+        sgi_bot.run_on_rows(2, None, 'get_rankings')
+    with pytest.raises(ValueError):
+        sgi_bot.run_on_rows(1, rows, 'add_strike', 7, 'spam')
+
+
+def test_shard_results_are_merged():
+    rankings = merge_rankings([
+        {'Senior': [{'user_id': 1, 'name': 'A', 'points': 3}]},
+        {'Senior': [{'user_id': 2, 'name': 'B', 'points': 9}], 'Junior': []}
+    ])
+    counts = merge_admin_counts([
+        {'total_users': 2, 'total_points': 5, 'tasks': {'daily1': 1}},
+        {'total_users': 1, 'total_points': 4, 'tasks': {'daily1': 2}}
+    ])
+
+    assert [entry['user_id'] for entry in rankings['Senior']] == [2, 1]
+    assert counts == {'total_users': 3, 'total_points': 9, 'tasks': {'daily1': 3}}
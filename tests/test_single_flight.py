@@ -0,0 +1,138 @@
+import threading
+import time
+
+import pytest
+
+from conftest import add_user
+from sgi_bot_phase1 import TASK_CATALOG, SingleFlight, current_stamps
+
+
+def test_concurrent_callers_share_one_fetch():
+    flight = SingleFlight(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+    calls = []
+
+    def fetch():
+        calls.append(1)
+        started.set()
+        release.wait(5)
+        return 'roster'
+
+    results = []
+    leader = threading.Thread(target=lambda: results.append(flight.do('roster', fetch)))
+    leader.start()
+    started.wait(5)
+    followers = [threading.Thread(target=lambda: results.append(flight.do('roster', fetch))) for _ in range(5)]
+    for thread in followers:
+        thread.start()
+    time.sleep(0.05)
+    release.set()
+    for thread in [leader, *followers]:
+        thread.join(5)
+
+    assert results == ['roster'] * 6
+    assert len(calls) == 1
+
+
+def test_result_is_cached_until_ttl_expires():
+    flight = SingleFlight(ttl=0.05)
+    values = iter([1, 2])
+    assert flight.do('key', lambda: next(values)) == 1
+    assert flight.do('key', lambda: next(values)) == 1
+    time.sleep(0.06)
+    assert flight.do('key', lambda: next(values)) == 2
+
+
+def test_invalidate_drops_cached_result():
+    flight = SingleFlight(ttl=60)
+    values = iter([1, 2])
+    assert flight.do('key', lambda: next(values)) == 1
+    flight.invalidate()
+    assert flight.do('key', lambda: next(values)) == 2
+
+
+def test_callers_after_invalidate_do_not_join_older_flight():
+    flight = SingleFlight(ttl=60)
+    data = {'value': 'old'}
+    started = threading.Event()
+    release = threading.Event()
+
+    def slow_fetch():
+        value = data['value']
+        started.set()
+        release.wait(5)
+        return value
+
+    stale = []
+    reader = threading.Thread(target=lambda: stale.append(flight.do('roster', slow_fetch)))
+    reader.start()
+    started.wait(5)
+
+    # A write lands while the read is in flight
+    data['value'] = 'new'
+    flight.invalidate()
+    assert flight.do('roster', lambda: data['value']) == 'new'
+
+    release.set()
+    reader.join(5)
+    assert stale == ['old']
+    # The stale flight must not have been cached either
+    assert flight.do('roster', lambda: 'refetched') == 'new'
+
+
+def test_followers_get_the_leaders_error():
+    flight = SingleFlight(ttl=60)
+    started = threading.Event()
+    release = threading.Event()
+
+    def failing_fetch():
+        started.set()
+        release.wait(5)
+        raise RuntimeError('quota')
+
+    errors = []
+
+    def call():
+        try:
+            flight.do('key', failing_fetch)
+        except RuntimeError as e:
+            errors.append(str(e))
+
+    leader = threading.Thread(target=call)
+    leader.start()
+    started.wait(5)
+    follower = threading.Thread(target=call)
+    follower.start()
+    time.sleep(0.05)
+    release.set()
+    leader.join(5)
+    follower.join(5)
+
+    assert errors == ['quota', 'quota']
+    with pytest.raises(RuntimeError):
+        flight.do('key', failing_fetch)
+
+
+def test_writes_never_use_a_read_started_before_an_earlier_write(sgi_bot, sheet):
+    add_user(sheet, 7, points=0)
+    release = sheet.hold = threading.Event()
+
+    # A /mystatus read starts and stalls with the pre-write rows
+    reader = threading.Thread(target=sgi_bot.run, args=('get_challenger_status', 7))
+    reader.start()
+    time.sleep(0.05)
+    sheet.hold = None
+
+    assert sgi_bot.run('update_task_completion', 7, 'daily1')[0]
+    assert sgi_bot.run('update_task_completion', 7, 'daily2')[0]
+    # Neither write waited on the stalled read
+    assert reader.is_alive()
+
+    release.set()
+    reader.join(5)
+    challenger = sgi_bot.load_roster().get(7)
+    assert challenger.points == 6
+    stamps = current_stamps()
+    assert challenger.is_done(TASK_CATALOG['daily1'], stamps)
+    assert challenger.is_done(TASK_CATALOG['daily2'], stamps)
@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+import sgi_bot_phase1
+from sgi_bot_phase1 import Standings
+
+
+class RankingsExecutor:
+    """Executor whose shards return fixed rankings, counting the gathers"""
+
+    def __init__(self, parts):
+        self.parts = parts
+        self.gathers = 0
+
+    async def gather(self, method):
+        assert method == 'get_rankings'
+        self.gathers += 1
+        return self.parts
+
+
+def ranked(*entries):
+    return [{'user_id': user_id, 'name': name, 'points': points} for user_id, name, points in entries]
+
+
+@pytest.fixture
+def rankings_executor(monkeypatch):
+    executor = RankingsExecutor([
+        {'Senior': ranked((1, 'Ann Lee', 30), (2, 'Bob', 20)), 'Junior': ranked((3, 'Anna', 5))},
+        {'Senior': ranked((4, 'Cleo', 25), (5, 'Dan Annis', 10)), 'Junior': [], 'Finalist': []}
+    ])
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', executor)
+    return executor
+
+
+def test_pages_are_built_from_one_load_per_version(rankings_executor):
+    standings = Standings(page_size=2, max_age=300)
+
+    async def browse():
+        first = await standings.render_page('Senior', 0)
+        second = await standings.render_page('Senior', 1)
+        clamped = await standings.render_page('Senior', 9)
+        return first, second, clamped
+
+    first, second, clamped = asyncio.run(browse())
+
+    assert first[0] == "Senior Group Leaderboard (page 1/2):\n\n1. Ann Lee: 30 pts\n2. Cleo: 25 pts"
+    assert second[0].endswith("3. Bob: 20 pts\n4. Dan Annis: 10 pts")
+    assert clamped == second
+    assert standings.page_count('Finalist') == 1
+    assert rankings_executor.gathers == 1
+
+    standings.bump()
+    assert asyncio.run(standings.find(5)) == ('Senior', 3)
+    assert rankings_executor.gathers == 2
+
+
+def test_load_reports_unavailable_storage(monkeypatch):
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', RankingsExecutor([{'Senior': []}, None]))
+    standings = Standings(page_size=2, max_age=300)
+
+    assert asyncio.run(standings.render_page('Senior', 0)) is None
+    assert asyncio.run(standings.find(1)) is None
+
+
+def search(standings, prefix, limit=10):
+    return [(group, index, user['name']) for group, index, user in asyncio.run(standings.search(prefix, limit))]
+
+
+def test_search_matches_name_and_word_prefixes(rankings_executor):
+    standings = Standings(page_size=10, max_age=300)
+
+    assert search(standings, 'ann') == [('Senior', 0, 'Ann Lee'), ('Junior', 0, 'Anna'), ('Senior', 3, 'Dan Annis')]
+    assert search(standings, 'lee') == [('Senior', 0, 'Ann Lee')]
+    assert search(standings, 'ann', limit=1) == [('Senior', 0, 'Ann Lee')]
+    assert search(standings, 'zed') == []
+    assert rankings_executor.gathers == 1
+
+
+def test_empty_search_returns_the_top_of_each_group(rankings_executor):
+    standings = Standings(page_size=10, max_age=300)
+
+    # Finalist has nobody ranked
+    assert search(standings, '', limit=3) == [('Senior', 0, 'Ann Lee'), ('Junior', 0, 'Anna')]
+
+
+def test_search_reports_unavailable_storage(monkeypatch):
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', RankingsExecutor([None]))
+
+    assert asyncio.run(Standings(page_size=10, max_age=300).search('ann', 10)) is None
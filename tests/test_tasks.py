@@ -0,0 +1,111 @@
+from datetime import date, timedelta
+
+import pytest
+
+from conftest import add_user, make_record
+from sgi_bot_phase1 import (
+    TASK_CATALOG, TASK_LAST_COLUMN, TASK_STATE_COLUMN, Challenger, Roster, current_stamps, day_ordinal,
+    format_task_last, format_task_state, legacy_task_last, parse_task_last, parse_task_state, week_ordinal
+)
+
+
+def test_task_state_round_trip():
+    state = {'weekly': (105701, 8), 'daily': (739908, 3)}
+    text = format_task_state(state)
+
+    assert text == 'daily@739908:3;weekly@105701:8'
+    assert parse_task_state(text) == state
+    assert parse_task_state('') == {}
+
+
+def test_empty_masks_are_not_written():
+    assert format_task_state({'daily': (739908, 0), 'weekly': (105701, 1)}) == 'weekly@105701:1'
+
+
+@pytest.mark.parametrize('value', ['daily@x:3', 'daily@739908:', 'garbage'])
+def test_bad_task_state_raises(value):
+    with pytest.raises(ValueError):
+        parse_task_state(value)
+
+
+def test_task_last_round_trip():
+    last = {'weekly1': 739905, 'daily1': 739908}
+    assert parse_task_last(format_task_last(last)) == last
+    with pytest.raises(ValueError):
+        parse_task_last('daily1:soon')
+
+
+def test_legacy_last_completions():
+    last = legacy_task_last({'Daily1_Last': '2025-09-25', 'Weekly1_Week': '2025-W39', 'Daily2_Last': '25/09/2025'})
+
+    assert last == {'daily1': date(2025, 9, 25).toordinal(), 'weekly1': date(2025, 9, 22).toordinal()}
+    assert TASK_CATALOG['weekly1'].format_day(last['weekly1']) == '2025-W39'
+    assert TASK_CATALOG['daily1'].format_day(last['daily1']) == '2025-09-25'
+
+
+def test_completion_only_counts_in_its_period():
+    today = date.today()
+    daily1 = TASK_CATALOG['daily1']
+    weekly1 = TASK_CATALOG['weekly1']
+    challenger = Challenger(2, 7, 'Ann', None, task_state={
+        'daily': (day_ordinal(today - timedelta(days=1)), 1 << daily1.bit),
+        'weekly': (week_ordinal(today), 1 << weekly1.bit)
+    })
+    stamps = current_stamps()
+
+    assert not challenger.is_done(daily1, stamps)
+    assert challenger.is_done(weekly1, stamps)
+
+    state = challenger.with_task_done(TASK_CATALOG['daily2'], stamps)
+    # Yesterday's daily mask is dropped, this week's mask kept
+    assert state == {
+        'daily': (stamps['daily'], 1 << TASK_CATALOG['daily2'].bit),
+        'weekly': (stamps['weekly'], 1 << weekly1.bit)
+    }
+
+
+def test_done_writes_state_points_and_last_day_in_one_call(sgi_bot, sheet):
+    add_user(sheet, 7, points=4)
+
+    success, message = sgi_bot.run('update_task_completion', 7, 'DAILY1')
+
+    assert success
+    assert message == 'Task completed. +3 points. Total: 7'
+    assert sheet.calls.count('update_cells') == 1
+    record = dict(zip(sheet.rows[0], sheet.rows[1]))
+    assert record['Current_Points'] == 7
+    assert record[TASK_LAST_COLUMN] == f"daily1:{date.today().toordinal()}"
+
+    success, message = sgi_bot.run('update_task_completion', 7, 'daily1')
+    assert not success
+    assert message == 'You already completed daily1 today'
+
+
+def test_user_stats_show_last_completions(sgi_bot, sheet):
+    sheet.rows[0].append('Daily1_Last')
+    add_user(sheet, 7, Daily1_Last='2025-09-25')
+
+    stats = sgi_bot.run('get_user_stats', 7)
+
+    assert 'Last Completions:\nDaily 1: 2025-09-25\nDaily 2: Never' in stats
+
+
+def test_ensure_column_rereads_headers_added_by_another_worker(sgi_bot, sheet):
+    assert 'Task_State' not in sgi_bot.get_column_indices()
+
+    # Another worker process adds the column meanwhile
+    sheet.rows[0].append(TASK_STATE_COLUMN)
+    sheet.col_count += 1
+
+    assert sgi_bot.ensure_column(TASK_STATE_COLUMN) == 7
+    assert 'add_cols' not in sheet.calls
+    assert 'update_cell' not in sheet.calls
+
+    assert sgi_bot.ensure_column(TASK_LAST_COLUMN) == 8
+    assert sheet.col_count == 8
+    assert sheet.rows[0][-1] == TASK_LAST_COLUMN
+
+
+def test_malformed_task_state_marks_row_invalid():
+    roster = Roster.from_records([make_record(7, **{TASK_STATE_COLUMN: 'daily@soon'})])
+    assert roster.is_invalid(7)
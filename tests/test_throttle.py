@@ -0,0 +1,120 @@
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+import sgi_bot_phase1
+from conftest import add_user
+from sgi_bot_phase1 import (
+    CommandThrottle, IngestProcessor, IngestQueue, LocalExecutor, command_refused, format_throttle_stats,
+    parse_throttle_limits, throttle_command
+)
+
+
+class Clock:
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(sgi_bot_phase1.time, 'monotonic', clock)
+    return clock
+
+
+def test_parse_throttle_limits():
+    assert parse_throttle_limits(' MyStatus=3/60, done=5/1.5,') == {'mystatus': (3, 60.0), 'done': (5, 1.5)}
+    assert parse_throttle_limits('') == {}
+
+
+@pytest.mark.parametrize('spec', ['done', 'done=5', 'done=0/60', 'done=5/0', 'done=x/60'])
+def test_parse_throttle_limits_rejects_bad_entries(spec):
+    with pytest.raises(ValueError):
+        parse_throttle_limits(spec)
+
+
+def test_burst_then_wait_for_a_refill(clock):
+    throttle = CommandThrottle({'done': (2, 60)}, cache_seconds=10)
+    assert throttle.allow(7, 'done') == 0
+    assert throttle.allow(7, 'done') == 0
+    assert throttle.allow(7, 'done') == 30
+    # Other users and unlimited commands have their own budget
+    assert throttle.allow(8, 'done') == 0
+    assert throttle.allow(7, 'help') == 0
+
+    clock.now += 29
+    assert throttle.allow(7, 'done') == 1
+    clock.now += 1
+    assert throttle.allow(7, 'done') == 0
+    assert throttle.hits == {'done': 2}
+
+
+def test_cached_replies_expire_and_are_forgotten(clock):
+    throttle = CommandThrottle({}, cache_seconds=10)
+    throttle.remember(7, '/mystatus', 'reply')
+    assert throttle.cached_reply(7, '/mystatus') == 'reply'
+    assert throttle.cached_reply(8, '/mystatus') is None
+
+    throttle.forget(7)
+    assert throttle.cached_reply(7, '/mystatus') is None
+
+    throttle.remember(7, '/mystatus', 'reply')
+    clock.now += 10
+    assert throttle.cached_reply(7, '/mystatus') is None
+    assert throttle.cache_hits == 1
+
+
+def test_prune_drops_full_buckets_and_stale_replies(clock):
+    throttle = CommandThrottle({'done': (2, 60)}, cache_seconds=10)
+    throttle.allow(7, 'done')
+    throttle.remember(7, '/mystatus', 'reply')
+
+    clock.now += 61
+    throttle.prune(clock.now)
+    assert throttle.buckets == {}
+    assert throttle.replies == {}
+
+
+def test_format_throttle_stats():
+    throttle = CommandThrottle({}, cache_seconds=10)
+    assert 'Rejected: none' in format_throttle_stats(throttle)
+    throttle.hits = {'mystatus': 2, 'done': 1}
+    throttle.cache_hits = 4
+    assert format_throttle_stats(throttle) == "Throttling:\nRejected: /done: 1, /mystatus: 2\nAnswered from cache: 4"
+
+
+class FakeMessage:
+    def __init__(self):
+        self.replies = []
+
+    async def reply_text(self, text):
+        self.replies.append(text)
+
+
+def test_refused_done_is_answered_from_cache(sgi_bot, sheet, tmp_path, monkeypatch):
+    add_user(sheet, 7)
+    queue = IngestQueue(str(tmp_path / 'queue.db'), max_depth=10)
+    throttle = CommandThrottle({'done': (5, 60)}, cache_seconds=60)
+    monkeypatch.setattr(sgi_bot_phase1, 'executor', LocalExecutor(sgi_bot))
+    monkeypatch.setattr(sgi_bot_phase1, 'throttle', throttle)
+    processor = IngestProcessor(queue, None, on_refused=command_refused)
+    queue.enqueue(1, 7, 5, 10, 'update_task_completion', [7, 'daily1'])
+    queue.enqueue(2, 7, 5, 11, 'update_task_completion', [7, 'daily1'])
+    assert asyncio.run(processor.process_shard(queue.pending(10)))
+
+    message = FakeMessage()
+    update = SimpleNamespace(effective_user=SimpleNamespace(id=7), message=message)
+    context = SimpleNamespace(args=['Daily1'])
+    reads = sheet.calls.count('get_all_records')
+
+    assert not asyncio.run(throttle_command(update, context, 'done'))
+    assert message.replies == [queue.conn.execute("SELECT result FROM ingest_queue WHERE update_id = 2").fetchone()[0]]
+    assert 'already completed' in message.replies[0]
+    assert sheet.calls.count('get_all_records') == reads
+    # A successful write to the user drops the cached refusal
+    throttle.forget(7)
+    assert asyncio.run(throttle_command(update, context, 'done'))